@@ -1,2 +1,18 @@
 # -*- coding: utf-8 -*-
+from odoo.tools import sql
+
+from . import controllers
 from . import models
+from . import tools
+
+
+def pre_init_hook(env):
+    """Create the stored CABYS column beforehand, so that installing the module
+    does not recompute it through the ORM for every existing invoice line."""
+    if not sql.column_exists(env.cr, "account_move_line", "cabys_code"):
+        sql.create_column(env.cr, "account_move_line", "cabys_code", "varchar")
+
+
+def post_init_hook(env):
+    """Backfill the stored CABYS of existing invoice lines in chunks."""
+    env["account.move.line"]._clocky_backfill_cabys_code()
@@ -2,7 +2,7 @@
 {
     "name": "Factura electrónica para clientes de Costa Rica",
     "summary": "Módulo para Facturación Electrónica en Costa Rica con soporte CABYS",
-    "version": "17.0.1.0.0",
+    "version": "17.0.1.1.0",
     "category": "Accounting/Accounting",
     "author": "James / Clocky",
     "license": "LGPL-3",
@@ -13,19 +13,30 @@
     ],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron_data.xml",
         "views/facturar_views.xml",
         "views/account_move_inherit.xml",
         "views/account_invoice_cabys_view.xml",
+        "views/clocky_fe_outbox_views.xml",
+        "views/clocky_fe_send_log_views.xml",
+        "views/clocky_fe_resend_wizard_views.xml",
+        "views/clocky_cabys_catalog_views.xml",
+        "views/res_config_settings_views.xml",
     ],
     "assets": {
         # Archivos JavaScript cargados en los assets del Punto de Venta (POS)
         "point_of_sale._assets_pos": [
+            "clocky_accounting_integration/static/src/js/clocky_pos_logger.js",
             "clocky_accounting_integration/static/src/js/clocky_pos_helpers.js",
-            "clocky_accounting_integration/static/src/js/clocky_pos_payload.js",
+            "clocky_accounting_integration/static/src/js/clocky_pos_product_meta.js",
+            "clocky_accounting_integration/static/src/js/clocky_pos_summary.js",
             "clocky_accounting_integration/static/src/js/clocky_pos_gas_service.js",
+            "clocky_accounting_integration/static/src/js/clocky_pos_outbox.js",
             "clocky_accounting_integration/static/src/js/clocky_pos_payment_patch.js",
         ],
     },
+    "pre_init_hook": "pre_init_hook",
+    "post_init_hook": "post_init_hook",
     "installable": True,
     "application": False,
 }
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky FE metrics endpoint
+Description:
+    Exposes the FE pipeline metrics (`tools.metrics`) of the Odoo process
+    serving the request, with the state of its circuit breakers
+    (`tools.circuit_breaker`):
+
+        GET /clocky/fe/metrics                    -> JSON
+        GET /clocky/fe/metrics?format=prometheus  -> Prometheus text format
+
+    The endpoint is disabled (404) until the system parameter
+    `clocky.metrics_token` is set; the token must then be sent as
+    `Authorization: Bearer <token>` or as the `token` query parameter.
+"""
+
+import json
+
+from odoo import http
+from odoo.http import request
+from odoo.tools import consteq
+
+from ..tools import circuit_breaker, metrics
+
+
+class ClockyFeMetricsController(http.Controller):
+
+    @http.route("/clocky/fe/metrics", type="http", auth="public", methods=["GET"], csrf=False, save_session=False)
+    def clocky_fe_metrics(self, format="json", token=None, **kwargs):
+        expected = request.env["clocky.settings"].sudo()._get("metrics_token")
+        auth = request.httprequest.headers.get("Authorization") or ""
+        provided = auth[7:].strip() if auth.lower().startswith("bearer ") else (token or "")
+        if not expected or not consteq(provided, expected):
+            return request.not_found()
+
+        if format == "prometheus":
+            return request.make_response(
+                metrics.to_prometheus() + circuit_breaker.to_prometheus(),
+                headers=[("Content-Type", "text/plain; version=0.0.4; charset=utf-8")],
+            )
+        data = metrics.snapshot()
+        data["circuits"] = circuit_breaker.snapshot()
+        return request.make_response(
+            json.dumps(data),
+            headers=[("Content-Type", "application/json")],
+        )
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["account.move.line"]._clocky_backfill_cabys_code()
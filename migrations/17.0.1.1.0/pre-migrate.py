@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+from odoo.tools import sql
+
+
+def migrate(cr, version):
+    """Create `account_move_line.cabys_code` before the ORM does, to skip the
+    full recompute on upgrade (post-migrate backfills it in chunks)."""
+    if not sql.column_exists(cr, "account_move_line", "cabys_code"):
+        sql.create_column(cr, "account_move_line", "cabys_code", "varchar")
@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
+from . import clocky_settings
+from . import clocky_fe_numbering
 from . import facturar
 from . import account_move_line_cabys
+from . import account_move_fe_status
 from . import pos_order_inherit
+from . import pos_session_inherit
+from . import pos_config_inherit
+from . import res_config_settings
 from . import clocky_pos_integration
-
-
+from . import clocky_fe_outbox
+from . import clocky_fe_send_log
+from . import clocky_fe_resend_wizard
+from . import clocky_cabys_catalog
+from . import clocky_cabys_import_wizard
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Hacienda acceptance status polling
+Description:
+    Tracks what Hacienda finally decided on every invoice sent to GAS.
+
+    A cron asks the status endpoint about the invoices sent but still waiting
+    for Hacienda (`clocky_fe_state` = ``sent``), oldest check first, in
+    batches of `clocky.status_batch_size` documents per POST:
+
+        POST {"action": "status", "documents": [{"id", "clave", "consecutivo"}, ...]}
+        -> [{"id": 42, "status": "aceptado" | "rechazado" | "procesando", "message": "..."}]
+           (or {"results": [...]})
+
+    Only the documents whose status changed are written: one `write` per
+    new state (so the change is tracked in the chatter) and one bulk UPDATE
+    for the Hacienda messages. The check time of the whole batch is stamped
+    with a single UPDATE, so the next run moves on to the other documents.
+
+    `clocky_fe_status_date` (when Hacienda's answer was recorded) is indexed
+    together with the state (``clocky_fe_state, clocky_fe_status_date``),
+    e.g. for "all rejected this week".
+
+Recommended System Parameters:
+    - clocky.fe_status_url          (status endpoint; default: the invoice URL,
+                                     with "action": "status" in the body)
+    - clocky.status_poll_limit      (documents checked per cron run, default 500)
+    - clocky.status_batch_size      (documents per status request, default 100)
+"""
+
+import json
+import logging
+import threading
+
+from odoo import api, fields, models
+from odoo.tools import split_every
+from odoo.tools.sql import create_index
+
+from ..tools import metrics, transport
+
+_logger = logging.getLogger(__name__)
+
+# Status answered by GAS -> clocky_fe_state (anything else: still waiting)
+HACIENDA_STATES = {
+    "aceptado": "accepted",
+    "accepted": "accepted",
+    "rechazado": "rejected",
+    "rejected": "rejected",
+}
+
+
+def map_status_results(body):
+    """Return ``{document id: result dict}`` from a status response body (None if unreadable)."""
+    try:
+        parsed = json.loads(body or "")
+    except ValueError:
+        return None
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results")
+    if not isinstance(parsed, list):
+        return None
+    results = {}
+    for item in parsed:
+        if isinstance(item, dict) and item.get("id") is not None:
+            try:
+                results[int(item["id"])] = item
+            except (TypeError, ValueError):
+                continue
+    return results
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    clocky_fe_status_date = fields.Datetime(
+        string="Fecha respuesta Hacienda", readonly=True, copy=False, index=True,
+    )
+    clocky_fe_status_message = fields.Text(string="Mensaje de Hacienda", readonly=True, copy=False)
+    clocky_fe_checked_date = fields.Datetime(string="Última consulta FE", readonly=True, copy=False)
+
+    def init(self):
+        super().init()
+        # "All rejected this week": equality on the state, range on the date
+        create_index(
+            self._cr, "account_move_clocky_fe_state_status_date_index", self._table,
+            ["clocky_fe_state", "clocky_fe_status_date"],
+        )
+
+    @api.model
+    def _clocky_status_settings(self):
+        params = self.env["clocky.settings"]._get_all()
+        token = params["facturar_post_token"]
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return {
+            "url": params["fe_status_url"] or params["facturar_post_url"],
+            "headers": headers,
+            "options": transport.options_from_settings(params, stage="invoice.status_poll"),
+            "limit": params["status_poll_limit"],
+            "batch_size": max(params["status_batch_size"], 1),
+        }
+
+    @api.model
+    def _cron_clocky_poll_fe_status(self, limit=None):
+        """Ask GAS for the Hacienda status of the sent invoices and record the changes.
+
+        Returns the number of documents whose status changed.
+        """
+        settings = self._clocky_status_settings()
+        if not settings["url"]:
+            return 0
+        limit = limit or settings["limit"]
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        self.env.cr.execute(
+            """
+            SELECT id FROM account_move
+             WHERE clocky_fe_state = 'sent'
+             ORDER BY clocky_fe_checked_date NULLS FIRST, id
+             LIMIT %s
+            """,
+            [limit],
+        )
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        changed = 0
+        for batch in split_every(settings["batch_size"], ids, self.sudo().browse):
+            changed += batch._clocky_poll_fe_status(settings)
+            if auto_commit:
+                self.env.cr.commit()
+        return changed
+
+    def _clocky_poll_fe_status(self, settings):
+        """Query the status of `self` in one request and write the changed ones."""
+        body = {
+            "action": "status",
+            "documents": [
+                {"id": move.id, "clave": move.clocky_fe_clave or None,
+                 "consecutivo": move.clocky_fe_consecutivo or None}
+                for move in self
+            ],
+        }
+        try:
+            with metrics.timed("invoice.status_poll"):
+                _status, response = transport.post_json(
+                    settings["url"], body, headers=settings["headers"], **settings["options"]
+                )
+        except transport.TransportError as e:
+            _logger.warning("Clocky FE status poll of %s documents failed: %s", len(self), e)
+            return 0
+
+        results = map_status_results(response)
+        if results is None:
+            metrics.count_error("invoice.status_poll", "UnrecognizedStatusResponse")
+            _logger.warning("Clocky FE status poll: unrecognized response %s", (response or "")[:500])
+            return 0
+
+        now = fields.Datetime.now()
+        by_state = {}
+        messages = {}
+        for move in self:
+            item = results.get(move.id) or {}
+            state = HACIENDA_STATES.get(str(item.get("status") or "").strip().lower())
+            if state and state != move.clocky_fe_state:
+                by_state.setdefault(state, []).append(move.id)
+                messages[move.id] = str(item.get("message") or item.get("mensaje") or "")
+
+        for state, move_ids in by_state.items():
+            self.browse(move_ids).write({"clocky_fe_state": state, "clocky_fe_status_date": now})
+        self.env.flush_all()
+        if messages:
+            self.env.cr.execute(
+                """
+                UPDATE account_move m
+                   SET clocky_fe_status_message = v.message
+                  FROM unnest(%s::int[], %s::text[]) AS v(id, message)
+                 WHERE m.id = v.id
+                """,
+                [list(messages), list(messages.values())],
+            )
+        self.env.cr.execute(
+            "UPDATE account_move SET clocky_fe_checked_date = %s WHERE id IN %s",
+            [now, tuple(self.ids)],
+        )
+        self.invalidate_recordset(["clocky_fe_status_message", "clocky_fe_checked_date"])
+        return len(messages)
@@ -10,14 +10,48 @@ Description:
     product and service descriptions for electronic invoicing (Facturación Electrónica).
     This field is dynamically computed from the product or its template.
 
+Fields:
+    - cabys:       non-stored, always computed from the current product.
+    - cabys_code:  stored and indexed copy, usable in searches, group by,
+                   exports and reports. Recomputed by the ORM only for the
+                   lines of a product whose CABYS changes.
+
 Methods:
-    - _compute_cabys():
-        Computes the CABYS code for each invoice line by checking various potential
-        CABYS-related fields in the associated product and its template.
-        The first valid match found among the candidate field names is used.
+    - _clocky_cabys_field_names():
+        Returns the candidate CABYS field names that exist on the product model.
+        Resolved once per registry (ormcache) instead of probing every line.
+    - _clocky_cabys_by_product(products):
+        Reads the resolved fields for all the given products in one batch and
+        returns {product_id: code}. The first valid match among the candidate
+        field names is used.
+    - _compute_cabys() / _compute_cabys_code():
+        Assign the CABYS code of each invoice line from the batched read.
+    - _clocky_backfill_cabys_code(chunk_size):
+        Fills `cabys_code` for existing lines in chunks of products, with one
+        UPDATE per chunk (used by the install hook and the migration).
 """
 
-from odoo import api, fields, models
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+# Possible field names holding the CABYS code, depending on the module or
+# customization used in the database (in order of preference).
+CABYS_FIELD_CANDIDATES = (
+    'cabys', 'cabys_code', 'l10n_cr_cabys', 'l10n_cr_cabys_code',
+    'x_cabys', 'x_cabys_code',
+)
+
+
+def _cabys_depends(model):
+    """Dependencies of the stored CABYS: the product and its existing CABYS fields."""
+    product_fields = model.pool['product.product']._fields
+    return ['product_id'] + [
+        'product_id.%s' % name for name in CABYS_FIELD_CANDIDATES if name in product_fields
+    ]
 
 
 class AccountMoveLine(models.Model):
@@ -25,37 +59,94 @@ class AccountMoveLine(models.Model):
 
     # Campo calculado para mostrar el código CABYS del producto
     cabys = fields.Char(string="CABYS", compute="_compute_cabys", store=False)
+    # Copia almacenada e indexada para búsquedas, agrupaciones y reportes
+    cabys_code = fields.Char(
+        string="Código CABYS", compute="_compute_cabys_code", store=True, index=True,
+    )
+
+    @api.model
+    @tools.ormcache()
+    def _clocky_cabys_field_names(self):
+        """
+        Return the CABYS candidate fields present on `product.product`.
+
+        `product.product` inherits every `product.template` field through
+        `_inherits`, so checking its `_fields` covers both models. The result
+        only depends on the installed modules, hence it is cached for the
+        lifetime of the registry.
+        """
+        product_fields = self.env['product.product']._fields
+        return tuple(name for name in CABYS_FIELD_CANDIDATES if name in product_fields)
+
+    @api.model
+    def _clocky_cabys_by_product(self, products):
+        """Return {product_id: cabys_code} for `products`, read in one batch."""
+        names = self._clocky_cabys_field_names()
+        codes = {}
+        if names and products:
+            for row in products.read(list(names)):
+                for name in names:
+                    value = row.get(name)
+                    if isinstance(value, tuple):
+                        # many2one to a CABYS catalog: (id, display_name)
+                        value = value[1]
+                    if value:
+                        codes[row['id']] = value
+                        break
+        return codes
 
     @api.depends('product_id', 'product_id.product_tmpl_id')
     def _compute_cabys(self):
         """
-        Attempts to retrieve the CABYS code from the product or its template.
+        Retrieves the CABYS code from the product or its template.
 
-        The method loops through a list of possible field names that might
-        store the CABYS code, depending on the module or customization used
-        in the database. Once a valid code is found, it is assigned to the line.
+        Logic:
+            1. Get the candidate fields that exist in this database (cached).
+            2. Read them for all the products of the recordset in one batch.
+            3. Assign to each line the first valid CABYS code found.
 
         If no CABYS code is found, the field remains empty.
-
-        Logic:
-            1. Define a list of candidate field names.
-            2. Iterate through invoice lines.
-            3. Check if any of the candidate fields exist and contain a value.
-            4. Assign the first valid CABYS code found.
         """
-        candidates = [
-            'cabys', 'cabys_code', 'l10n_cr_cabys', 'l10n_cr_cabys_code',
-            'x_cabys', 'x_cabys_code'
-        ]
+        codes = self._clocky_cabys_by_product(self.product_id)
+        for line in self:
+            line.cabys = codes.get(line.product_id.id, "")
+
+    @api.depends(_cabys_depends)
+    def _compute_cabys_code(self):
+        """Stored variant of `_compute_cabys` (empty codes are stored as NULL)."""
+        codes = self._clocky_cabys_by_product(self.product_id)
         for line in self:
-            code = ""
-            prod = line.product_id
-            tmpl = prod.product_tmpl_id
-            for name in candidates:
-                if hasattr(prod, name) and getattr(prod, name):
-                    code = getattr(prod, name)
-                    break
-                if hasattr(tmpl, name) and getattr(tmpl, name):
-                    code = getattr(tmpl, name)
-                    break
-            line.cabys = code or ""
+            line.cabys_code = codes.get(line.product_id.id) or False
+
+    @api.model
+    def _clocky_backfill_cabys_code(self, chunk_size=1000):
+        """
+        Fill `cabys_code` for all existing lines, chunk by chunk of products.
+
+        Lines are updated straight in SQL (one UPDATE per chunk of products)
+        so that millions of lines never go through the ORM cache.
+        """
+        self.env.cr.execute(
+            "SELECT DISTINCT product_id FROM account_move_line WHERE product_id IS NOT NULL"
+        )
+        product_ids = [row[0] for row in self.env.cr.fetchall()]
+        Product = self.env['product.product'].with_context(active_test=False)
+        done = 0
+        for chunk in split_every(chunk_size, product_ids):
+            codes = self._clocky_cabys_by_product(Product.browse(chunk))
+            if codes:
+                self.env.cr.execute(
+                    """
+                    UPDATE account_move_line l
+                       SET cabys_code = v.code
+                      FROM (SELECT unnest(%s::int[]) AS product_id,
+                                   unnest(%s::varchar[]) AS code) v
+                     WHERE l.product_id = v.product_id
+                       AND l.cabys_code IS DISTINCT FROM v.code
+                    """,
+                    [list(codes), [str(code) for code in codes.values()]],
+                )
+            Product.invalidate_model()
+            done += len(chunk)
+            _logger.info("Clocky CABYS backfill: %s/%s products", done, len(product_ids))
+        self.invalidate_model(['cabys_code'])
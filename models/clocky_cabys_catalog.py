@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Title: CABYS Catalog
+Description:
+    Local copy of the official CABYS catalog published by Hacienda (the
+    13-digit codes of goods and services), used to validate the CABYS codes
+    of the invoice lines before anything is sent to GAS, instead of finding
+    out when Hacienda rejects the document.
+
+    The catalog (~20k rows) is imported from the official CSV or XLSX file
+    (`clocky.cabys.import.wizard`): rows are streamed from the file and
+    upserted in chunks with ``INSERT ... ON CONFLICT (code) DO UPDATE``, so
+    re-importing a newer version of the catalog updates it in place.
+
+    Lookups:
+      - `code` has a unique btree index plus a ``text_pattern_ops`` index for
+        prefix searches (``code =like '4321%'``), whatever the DB collation.
+      - `name` has a trigram index (`pg_trgm`, when available) for searches
+        by description.
+      - `_clocky_valid_codes()` returns the set of active codes, cached per
+        registry (ormcache) and invalidated on every import/write.
+
+    Validation is only enforced once the catalog has been imported.
+"""
+
+import re
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+CABYS_CODE_RE = re.compile(r"\d{13}")
+
+
+def normalize_cabys(value):
+    """Return the 13-digit CABYS code found in `value` ("" if there is none).
+
+    Accepts values such as "4321000000100" or "4321000000100 - Arroz" (the
+    display name of a many2one to another CABYS catalog).
+    """
+    match = CABYS_CODE_RE.search(str(value or ""))
+    return match.group(0) if match else ""
+
+
+class ClockyCabysCatalog(models.Model):
+    _name = "clocky.cabys.catalog"
+    _description = "Catálogo CABYS (Clocky)"
+    _order = "code"
+    _rec_names_search = ["code", "name"]
+
+    code = fields.Char(string="Código", size=13, required=True, index=True)
+    name = fields.Char(string="Descripción", required=True, index="trigram")
+    tax_rate = fields.Float(string="Impuesto (%)", digits=(5, 2))
+    active = fields.Boolean(default=True)
+
+    _sql_constraints = [
+        ("code_uniq", "unique(code)", "El código CABYS debe ser único."),
+    ]
+
+    def init(self):
+        # Prefix searches (`=like 'xxxx%'`) use this index with any collation
+        create_index(
+            self._cr, "clocky_cabys_catalog_code_pattern_index", self._table,
+            ["code text_pattern_ops"],
+        )
+
+    @api.depends("code", "name")
+    def _compute_display_name(self):
+        for rec in self:
+            rec.display_name = "%s - %s" % (rec.code, rec.name) if rec.code else rec.name
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"code", "active"} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    # ---------- Lookup API ----------
+
+    @api.model
+    @tools.ormcache()
+    def _clocky_valid_codes(self):
+        """Return the frozenset of active CABYS codes (cached per registry)."""
+        self.env.cr.execute("SELECT code FROM clocky_cabys_catalog WHERE active")
+        return frozenset(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _clocky_lookup(self, code):
+        """Return the catalog record of `code` (normalized), or an empty recordset."""
+        code = normalize_cabys(code)
+        if not code or code not in self._clocky_valid_codes():
+            return self.browse()
+        return self.search([("code", "=", code)], limit=1)
+
+    @api.model
+    def _clocky_search_prefix(self, prefix, limit=20):
+        """Return the active codes starting with `prefix` (uses the pattern index)."""
+        prefix = re.sub(r"\D", "", prefix or "")
+        if not prefix:
+            return self.browse()
+        return self.search([("code", "=like", prefix + "%")], limit=limit)
+
+    @api.model
+    def _clocky_invalid_codes(self, codes):
+        """Return the codes of `codes` that are not active CABYS codes.
+
+        Always empty while the catalog has not been imported, so the
+        validation never blocks a database that does not use it.
+        """
+        valid = self._clocky_valid_codes()
+        if not valid:
+            return []
+        return sorted({code for code in codes if normalize_cabys(code) not in valid})
+
+    # ---------- Bulk import ----------
+
+    @api.model
+    def _clocky_upsert(self, rows):
+        """Insert or update `rows` ((code, name, tax_rate) tuples) in one statement."""
+        if not rows:
+            return
+        self.env.cr.execute(
+            """
+            INSERT INTO clocky_cabys_catalog
+                   (code, name, tax_rate, active, create_uid, create_date, write_uid, write_date)
+            SELECT v.code, v.name, v.tax_rate, TRUE, %s, now() at time zone 'UTC',
+                   %s, now() at time zone 'UTC'
+              FROM unnest(%s::varchar[], %s::varchar[], %s::numeric[]) AS v(code, name, tax_rate)
+                ON CONFLICT (code) DO UPDATE
+               SET name = EXCLUDED.name,
+                   tax_rate = EXCLUDED.tax_rate,
+                   active = TRUE,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+            """,
+            [
+                self.env.uid, self.env.uid,
+                [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows],
+            ],
+        )
+
+    @api.model
+    def _clocky_import_rows(self, rows, chunk_size=1000):
+        """Upsert the (code, name, tax_rate) tuples of the iterable `rows`, chunk by chunk.
+
+        Rows without a valid 13-digit code are skipped; a code repeated in the
+        file keeps its last row. Returns ``(imported, skipped)``.
+        """
+        imported = skipped = 0
+        chunk = {}
+        for code, name, tax_rate in rows:
+            code = normalize_cabys(code)
+            name = (str(name).strip() if name is not None else "")
+            if not code or not name:
+                skipped += 1
+                continue
+            chunk[code] = (code, name[:1024], tax_rate)
+            if len(chunk) >= chunk_size:
+                self._clocky_upsert(list(chunk.values()))
+                imported += len(chunk)
+                chunk = {}
+        if chunk:
+            self._clocky_upsert(list(chunk.values()))
+            imported += len(chunk)
+        self.invalidate_model()
+        self.env.registry.clear_cache()
+        if not imported:
+            raise UserError(_("El archivo no contiene códigos CABYS válidos (13 dígitos)."))
+        return imported, skipped
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Title: CABYS Catalog Import Wizard
+Description:
+    Imports the official CABYS catalog (CSV or XLSX as published by
+    Hacienda) into `clocky.cabys.catalog`.
+
+    Rows are read one at a time (`csv` reader / openpyxl in read-only mode)
+    and handed to `_clocky_import_rows`, which upserts them in chunks: the
+    ~20k rows of the catalog are never loaded as ORM records.
+
+    Columns are located by their header (code: "código" or the last
+    "categoría" level, description: the last "descripción", tax:
+    "impuesto"); title rows above the header are skipped. Without a
+    recognizable header the first columns are used (code, description, tax).
+"""
+
+import base64
+import csv
+import io
+import unicodedata
+
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+
+from .clocky_cabys_catalog import normalize_cabys
+
+try:
+    import openpyxl
+except ImportError:  # XLSX import is optional
+    openpyxl = None
+
+
+
+def _normalize_header(value):
+    text = unicodedata.normalize("NFKD", str(value or "")).encode("ascii", "ignore").decode()
+    return text.strip().lower()
+
+
+def _last_index(names, predicate):
+    matches = [i for i, name in enumerate(names) if predicate(name)]
+    return matches[-1] if matches else None
+
+
+def _locate_columns(header):
+    """Return {"code": index, "name": index, "tax_rate": index or None} for `header`, or None."""
+    names = [_normalize_header(value) for value in header]
+    # The official file has one "Categoría N" / "Descripción (categoría N)"
+    # pair per level: the last level holds the 13-digit goods/services code
+    code = _last_index(names, lambda n: "codigo" in n)
+    if code is None:
+        code = _last_index(names, lambda n: "categoria" in n and "descripcion" not in n)
+    columns = {
+        "code": code,
+        "name": _last_index(names, lambda n: "descripcion" in n),
+        "tax_rate": _last_index(names, lambda n: any(k in n for k in ("impuesto", "tarifa", "iva"))),
+    }
+    if columns["code"] is None or columns["name"] is None:
+        return None
+    return columns
+
+
+def _parse_tax(value):
+    if value in (None, ""):
+        return None
+    try:
+        return float(str(value).replace("%", "").replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+def _iter_catalog_rows(rows):
+    """Yield (code, name, tax_rate) from raw rows (sequences), locating the header first."""
+    columns = None
+    for row in rows:
+        if not row:
+            continue
+        if columns is None:
+            columns = _locate_columns(row)
+            if columns is not None:
+                continue
+            if not normalize_cabys(row[0]):
+                # Title rows above the header
+                continue
+            # No header: code, description, tax
+            columns = {"code": 0, "name": 1, "tax_rate": 2}
+
+        def cell(key):
+            index = columns[key]
+            return row[index] if index is not None and index < len(row) else None
+
+        code = cell("code")
+        if isinstance(code, (int, float)):
+            # Numeric cell: restore the leading zeros of the 13-digit code
+            code = "%013d" % int(code)
+        yield code, cell("name"), _parse_tax(cell("tax_rate"))
+
+
+class ClockyCabysImportWizard(models.TransientModel):
+    _name = "clocky.cabys.import.wizard"
+    _description = "Importar catálogo CABYS (Clocky)"
+
+    file = fields.Binary(string="Archivo", required=True)
+    filename = fields.Char(string="Nombre del archivo")
+
+    def _read_csv(self, data):
+        text = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", errors="replace", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        return csv.reader(text, dialect)
+
+    def _read_xlsx(self, data):
+        if openpyxl is None:
+            raise UserError(_("Para importar archivos XLSX se requiere la librería Python 'openpyxl'."))
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        return workbook.active.iter_rows(values_only=True)
+
+    def action_import(self):
+        self.ensure_one()
+        data = base64.b64decode(self.file or b"")
+        is_xlsx = (self.filename or "").lower().endswith((".xlsx", ".xlsm")) or data[:2] == b"PK"
+        rows = self._read_xlsx(data) if is_xlsx else self._read_csv(data)
+        imported, skipped = self.env["clocky.cabys.catalog"]._clocky_import_rows(_iter_catalog_rows(rows))
+
+        message = _("%s códigos CABYS importados.") % imported
+        if skipped:
+            message += " " + _("%s filas sin código válido se omitieron.") % skipped
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Catálogo CABYS"),
+                "message": message,
+                "type": "success",
+                "sticky": False,
+                "next": {"type": "ir.actions.act_window_close"},
+            },
+        }
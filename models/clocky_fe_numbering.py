@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Hacienda consecutivo / clave allocation
+Description:
+    Allocates the Hacienda document numbers in Odoo instead of GAS, so
+    concurrent terminals never wait on a shared counter:
+
+      - consecutivo (20 digits): sucursal (3) + punto de venta (5)
+        + document type (2) + number (10)
+      - clave (50 digits): 506 + DDMMYY + issuer id (12) + consecutivo (20)
+        + situación (1) + security code (8)
+
+    One `ir.sequence` per (company, sucursal, punto, document type), with
+    the "standard" implementation: numbers come from a PostgreSQL sequence
+    (``nextval``), which takes no row lock and never waits on another
+    transaction. A batch of documents reserves its whole range with a single
+    ``nextval`` query. Like any PostgreSQL sequence, a rolled back
+    transaction leaves a gap in the numbering.
+
+    The sequence of a new key is created on first use, under a transaction
+    advisory lock so two workers never create it twice.
+
+    Numbers are assigned once and stored on the document
+    (`clocky_fe_consecutivo` / `clocky_fe_clave` on `account.move` and
+    `pos.order`) when it is first queued for sending. Documents GAS already
+    acknowledged keep the number GAS gave them and get none.
+
+Recommended System Parameters:
+    - clocky.fe_local_numbering     ('1'/'true' to allocate the numbers in Odoo;
+                                     otherwise GAS keeps allocating them)
+    - clocky.fe_sucursal            (sucursal of the back-office invoices, default 001)
+    - clocky.fe_punto               (punto de venta of the back-office invoices, default 00001)
+    - clocky.fe_situacion           (1 normal, 2 contingencia, 3 sin internet; default 1)
+"""
+
+import re
+import secrets
+
+from odoo import api, models
+
+# Hacienda document types
+DOC_TYPE_INVOICE = "01"
+DOC_TYPE_DEBIT_NOTE = "02"
+DOC_TYPE_CREDIT_NOTE = "03"
+DOC_TYPE_TICKET = "04"
+
+NUMBER_PADDING = 10
+
+
+def pad_digits(value, width):
+    """Keep the digits of `value`, left-padded with zeros to `width`."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return re.sub(r"\D", "", str(value or "")).zfill(width)
+
+
+class ClockyFeNumbering(models.AbstractModel):
+    _name = "clocky.fe.numbering"
+    _description = "Consecutivos y claves de Hacienda (Clocky)"
+
+    @api.model
+    def _sequence(self, company, sucursal, punto, doc_type):
+        """Return the `ir.sequence` of the key, created on first use."""
+        code = "clocky.fe.%s.%s.%s.%s" % (company.id, sucursal, punto, doc_type)
+        Sequence = self.env["ir.sequence"].sudo()
+        sequence = Sequence.search([("code", "=", code), ("company_id", "=", company.id)], limit=1)
+        if sequence:
+            return sequence
+        # Serialize the creation of this key only; the lock is released at commit
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [code])
+        sequence = Sequence.search([("code", "=", code), ("company_id", "=", company.id)], limit=1)
+        if not sequence:
+            sequence = Sequence.create({
+                "name": "Clocky FE %s-%s tipo %s" % (sucursal, punto, doc_type),
+                "code": code,
+                "implementation": "standard",
+                "padding": NUMBER_PADDING,
+                "number_increment": 1,
+                "company_id": company.id,
+            })
+        return sequence
+
+    @api.model
+    def _reserve(self, company, sucursal, punto, doc_type, count):
+        """Return `count` consecutivos of the key, reserved with one ``nextval`` query."""
+        sequence = self._sequence(company, sucursal, punto, doc_type)
+        self.env.cr.execute(
+            "SELECT nextval(%s) FROM generate_series(1, %s)",
+            ["ir_sequence_%03d" % sequence.id, count],
+        )
+        return [
+            "%s%s%s%s" % (sucursal, punto, doc_type, str(row[0]).zfill(NUMBER_PADDING))
+            for row in self.env.cr.fetchall()
+        ]
+
+    @api.model
+    def _clave(self, company, day, consecutivo, situacion="1"):
+        """Build the 50-digit clave of `consecutivo`, issued by `company` on `day`."""
+        return "506%s%s%s%s%08d" % (
+            day.strftime("%d%m%y"),
+            pad_digits(company.vat, 12)[-12:],
+            consecutivo,
+            situacion,
+            secrets.randbelow(10 ** 8),
+        )
+
+    @api.model
+    def _assign(self, records, key_of):
+        """Give a consecutivo and a clave to each record of `records` that has none.
+
+        `key_of(record)` returns ``(company, sucursal, punto, doc_type, day)``.
+        Records sharing a key reserve their numbers in one query.
+        Does nothing unless `clocky.fe_local_numbering` is set.
+        """
+        settings = self.env["clocky.settings"]._get_all()
+        if not settings["fe_local_numbering"]:
+            return
+        groups = {}
+        for record in records.filtered(lambda r: not r.clocky_fe_consecutivo):
+            company, sucursal, punto, doc_type, day = key_of(record)
+            groups.setdefault((company, sucursal, punto, doc_type), []).append((record, day))
+        situacion = pad_digits(settings["fe_situacion"], 1)[-1:]
+        for (company, sucursal, punto, doc_type), items in groups.items():
+            numbers = self._reserve(company, sucursal, punto, doc_type, len(items))
+            for (record, day), consecutivo in zip(items, numbers):
+                record.sudo().write({
+                    "clocky_fe_consecutivo": consecutivo,
+                    "clocky_fe_clave": self._clave(company, day, consecutivo, situacion),
+                })
+
+    @api.model
+    def _default_branch(self):
+        """(sucursal, punto) of the documents not issued from a POS."""
+        settings = self.env["clocky.settings"]._get_all()
+        return pad_digits(settings["fe_sucursal"], 3), pad_digits(settings["fe_punto"], 5)
@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky FE Outbox
+Description:
+    Durable queue for the electronic-invoice POSTs sent to GAS.
+
+    Invoices are enqueued in the same transaction that requests the send
+    (button, wizard or POS invoicing) and a cron job drains the queue in
+    batches, outside of the user's HTTP request. Failed sends are retried
+    with exponential backoff until `clocky.outbox_max_attempts` is reached.
+    Sends short-circuited by an open circuit breaker (see
+    `tools.circuit_breaker`) are retried after the breaker cooldown and do
+    not count as attempts.
+
+Recommended System Parameters:
+    - clocky.outbox_batch_limit     (max. records processed per cron run, default 100)
+    - clocky.outbox_max_attempts    (default 8)
+    - clocky.outbox_retry_base      (seconds, default 60)
+    - clocky.outbox_retry_max       (seconds, default 21600)
+    - clocky.facturar_batch_size    (documents per POST, default 1 = one POST per invoice)
+"""
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.tools import split_every
+
+from ..tools import metrics, transport
+
+_logger = logging.getLogger(__name__)
+
+# NOTE: Replace webhook.site URL with a private endpoint for production use.
+TEST_FALLBACK_URL = "https://webhook.site/c7f3f0a4-f206-47b9-9595-b7cfc58828f4"
+
+
+def payload_hash(payload):
+    """SHA-256 of the canonical JSON serialization of `payload`.
+
+    Keys are sorted and separators compact, so two payloads with the same
+    content always hash the same whatever the dict insertion order.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def map_batch_results(payloads, body):
+    """Map a batch response body to a list aligned with `payloads`.
+
+    Returns None when the body cannot be interpreted as per-item results.
+    """
+    try:
+        parsed = json.loads(body or "")
+    except ValueError:
+        return None
+    if isinstance(parsed, dict):
+        parsed = parsed.get("results")
+    if not isinstance(parsed, list):
+        return None
+
+    # Results carrying the invoice id are matched by id, whatever their order
+    by_id = {
+        item["id"]: item for item in parsed
+        if isinstance(item, dict) and item.get("id") is not None
+    }
+    ids = [p.get("invoice", {}).get("id") for p in payloads]
+    if by_id and all(i in by_id for i in ids):
+        return [by_id[i] for i in ids]
+    if len(parsed) == len(payloads):
+        return parsed
+    return None
+
+
+def rejected_item(item):
+    """True when a GAS result (of a batch or a single POST) reports a rejection."""
+    return isinstance(item, dict) and (item.get("ok") is False or bool(item.get("error")))
+
+
+def _post_one(settings, data):
+    """POST one request body. Safe to run in a worker thread: no ORM access.
+
+    Returns ``(status, body, error, duration)``, `error` being the exception
+    raised by the transport, if any.
+    """
+    start = time.perf_counter()
+    try:
+        with metrics.timed("invoice.http_send"):
+            status, body = transport.post_data(
+                settings["url"], data, headers=dict(settings["headers"]), **settings["options"]
+            )
+    except Exception as e:
+        return getattr(e, "status", None), getattr(e, "body", None), e, time.perf_counter() - start
+    return status, body, None, time.perf_counter() - start
+
+
+def _post_all(settings, jobs, concurrency=1):
+    """Yield ``(key, outcome)`` for each ``(key, data)`` job, as the POSTs complete.
+
+    With `concurrency` > 1 at most that many POSTs are in flight at a time
+    (bounded thread pool); the caller consumes the outcomes on its own thread.
+    """
+    if concurrency <= 1 or len(jobs) <= 1:
+        for key, data in jobs:
+            yield key, _post_one(settings, data)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="clocky-fe-send") as pool:
+        futures = {pool.submit(_post_one, settings, data): key for key, data in jobs}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+class ClockyFeOutbox(models.Model):
+    _name = "clocky.fe.outbox"
+    _description = "Cola de envío FE (Clocky)"
+    _order = "next_attempt, id"
+
+    move_id = fields.Many2one(
+        "account.move", string="Factura", required=True, index=True, ondelete="cascade",
+    )
+    company_id = fields.Many2one(related="move_id.company_id", store=True)
+    payload = fields.Text(string="Payload (JSON)", required=True)
+    payload_hash = fields.Char(string="Hash del payload", index=True, readonly=True)
+    state = fields.Selection(
+        [
+            ("pending", "Pendiente"),
+            ("done", "Enviado"),
+            ("failed", "Fallido"),
+            ("cancel", "Reemplazado"),
+        ],
+        string="Estado", default="pending", required=True, index=True,
+    )
+    attempts = fields.Integer(string="Intentos", default=0, readonly=True)
+    next_attempt = fields.Datetime(
+        string="Próximo intento", default=fields.Datetime.now, required=True, index=True,
+    )
+    last_status = fields.Integer(string="Último status HTTP", readonly=True)
+    last_response = fields.Text(string="Última respuesta", readonly=True)
+    last_error = fields.Text(string="Último error", readonly=True)
+
+    # ---------- Enqueue ----------
+
+    @api.model
+    def _enqueue_moves(self, moves, force=False):
+        """Build the payload of each move and enqueue it for sending.
+
+        Runs in the caller's transaction: if the caller rolls back, nothing is
+        sent. The queue is a technical model, so records are created as
+        superuser (invoicing and POS users have no access rights on it).
+
+        Sends are idempotent: a move whose payload hash matches the last one
+        acknowledged by GAS (`clocky_fe_sent_hash`), or that is already
+        pending with the same hash, is skipped. Pending records of a move
+        holding an older payload are superseded by the new one. With `force`,
+        moves already acknowledged with the same payload are enqueued again.
+        Moves with CABYS codes missing from `clocky.cabys.catalog` are not
+        enqueued: they are flagged ``invalid`` with a note listing the codes.
+        Moves that GAS never acknowledged get their Hacienda consecutivo /
+        clave here, before their payload is built (`clocky.fe.numbering`,
+        when local numbering is enabled); an acknowledged move keeps the
+        number GAS gave it, so it is never sent again under a second number.
+        Numbering first spends no number on a skipped move: a pending record
+        was built after numbering, so a move still without a number never
+        matches one. Each payload is then built and hashed once.
+        Returns the created outbox records.
+        """
+        moves = moves._clocky_reject_invalid_cabys()
+        unnumbered = moves.filtered(lambda m: not m.clocky_fe_sent_hash and not m.clocky_fe_consecutivo)
+        unnumbered._clocky_assign_fe_numbers()
+        payloads = moves._clocky_build_payloads()
+        pending = self.sudo().search([("move_id", "in", moves.ids), ("state", "=", "pending")])
+        queued = {(rec.move_id.id, rec.payload_hash) for rec in pending}
+
+        vals_list = []
+        for move in moves:
+            payload = payloads[move.id]
+            digest = payload_hash(payload)
+            if (digest == move.clocky_fe_sent_hash and not force) or (move.id, digest) in queued:
+                continue
+            with metrics.timed("invoice.serialize"):
+                data = transport.dumps(payload)
+            vals_list.append({
+                "move_id": move.id,
+                "payload": data,
+                "payload_hash": digest,
+            })
+
+        records = self.sudo().create(vals_list)
+        if records:
+            pending.filtered(lambda r: r.move_id in records.move_id).write({"state": "cancel"})
+            records.move_id._clocky_set_fe_state("queued")
+            self._trigger_cron()
+        return records
+
+    @api.model
+    def _trigger_cron(self):
+        cron = self.sudo().env.ref("clocky_accounting_integration.ir_cron_clocky_fe_outbox", raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    # ---------- Processing ----------
+
+    def _retry_delay(self, attempts):
+        """Exponential backoff (with a small jitter) for the given attempt number."""
+        settings = self.env["clocky.settings"]._get_all()
+        base = settings["outbox_retry_base"]
+        cap = settings["outbox_retry_max"]
+        delay = min(base * (2 ** max(attempts - 1, 0)), cap)
+        return timedelta(seconds=delay + random.uniform(0, delay * 0.1))
+
+    @api.model
+    def _cron_process_outbox(self, limit=None):
+        """Drain due outbox records in small locked chunks.
+
+        Each chunk is selected with ``FOR UPDATE SKIP LOCKED`` so concurrent
+        workers never send the same record twice, and is committed as soon as
+        it has been sent so a crash never re-sends already acknowledged items.
+        """
+        settings = self.env["clocky.settings"]._get_all()
+        limit = limit or settings["outbox_batch_limit"]
+        chunk = max(settings["facturar_batch_size"], 10)
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        processed = 0
+        while processed < limit:
+            self.env.cr.execute(
+                """
+                SELECT id FROM clocky_fe_outbox
+                 WHERE state = 'pending' AND next_attempt <= (now() at time zone 'utc')
+                 ORDER BY next_attempt, id
+                 LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+                """,
+                [min(chunk, limit - processed)],
+            )
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            self.browse(ids)._send()
+            processed += len(ids)
+            if auto_commit:
+                self.env.cr.commit()
+        return processed
+
+    def _lock_for_send(self):
+        """Lock the pending records of `self` and return them.
+
+        Records already locked by another transaction (a running cron) are
+        skipped, like in `_cron_process_outbox`, so nothing is sent twice.
+        """
+        if not self:
+            return self
+        self.env.flush_all()
+        self.env.cr.execute(
+            """
+            SELECT id FROM clocky_fe_outbox
+             WHERE id IN %s AND state = 'pending'
+               FOR UPDATE SKIP LOCKED
+            """,
+            [tuple(self.ids)],
+        )
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    def _send_settings(self):
+        params = self.env["clocky.settings"]._get_all()
+        url = params["facturar_post_url"] or TEST_FALLBACK_URL
+        token = params["facturar_post_token"]
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        return {
+            "url": url,
+            "headers": headers,
+            "options": transport.options_from_settings(params, stage="invoice.http_send"),
+            "max_attempts": params["outbox_max_attempts"],
+            "breaker_cooldown": params["breaker_cooldown"],
+            "batch_size": max(params["facturar_batch_size"], 1),
+        }
+
+    def _send(self, concurrency=1):
+        """Send the records to GAS and update their state (retry on failure).
+
+        With `clocky.facturar_batch_size` > 1 the payloads are grouped into
+        JSON arrays of that size, one POST per group (see `_apply_batch`).
+        With `concurrency` > 1 the POSTs run in a bounded thread pool; the
+        threads only do network I/O, every database write happens here, on
+        the caller's cursor, as the responses arrive.
+        Every attempt is recorded in `clocky.fe.send.log` (one batch insert).
+        """
+        settings = self._send_settings()
+        settings["logs"] = []
+        if settings["batch_size"] <= 1:
+            groups = list(self)
+        else:
+            groups = list(split_every(settings["batch_size"], self.ids, self.browse))
+        jobs = [(group, group._request_body(settings["batch_size"] > 1)) for group in groups]
+        try:
+            for group, outcome in _post_all(settings, jobs, concurrency):
+                if settings["batch_size"] <= 1:
+                    group._apply_single(settings, outcome)
+                else:
+                    group._apply_batch(settings, outcome)
+        finally:
+            if settings["logs"]:
+                self.env["clocky.fe.send.log"]._log_sends(settings["logs"])
+
+    def _request_body(self, as_array=False):
+        """Request body of `self`: the stored JSON, or a JSON array in batch mode.
+
+        The payloads are already compact JSON: each one is encoded once and
+        the array is joined as bytes (no decode / re-encode of the whole body).
+        """
+        if not as_array:
+            self.ensure_one()
+            return self.payload.encode("utf-8")
+        return b"[" + b",".join(payload.encode("utf-8") for payload in self.mapped("payload")) + b"]"
+
+    def _apply_single(self, settings, outcome):
+        self.ensure_one()
+        status, body, error, duration = outcome
+        if error:
+            self._mark_failed(
+                settings, str(error), status=status, body=body,
+                duration=duration, error_type=error.__class__.__name__,
+            )
+            return
+        # A 200 answer can still carry {"ok": false, "error": ...}
+        try:
+            item = json.loads(body or "")
+        except ValueError:
+            item = None
+        if rejected_item(item):
+            self._mark_failed(settings, str(item.get("error") or body), status=status,
+                              body=body, duration=duration, error_type="RejectedBatchItem")
+        else:
+            self._mark_done(settings, status, body, duration=duration)
+
+    def _apply_batch(self, settings, outcome):
+        """Apply the answer of a POST holding all the payloads of `self`.
+
+        GAS answers with an array (or ``{"results": [...]}``) holding one result
+        per document, either in the same order as the request or carrying the
+        invoice ``id``. Items with ``"ok": false`` or an ``"error"`` are retried
+        individually; an unreadable answer retries the whole batch.
+        """
+        status, body, error, duration = outcome
+        if error:
+            for rec in self:
+                rec._mark_failed(
+                    settings, str(error), status=status, body=body,
+                    duration=duration, error_type=error.__class__.__name__,
+                )
+            return
+
+        payloads = [json.loads(rec.payload) for rec in self]
+        with metrics.timed("invoice.response_parse"):
+            results = map_batch_results(payloads, body)
+        if results is None:
+            metrics.count_error("invoice.response_parse", "UnrecognizedBatchResponse")
+            error = _("Respuesta de lote no reconocida (status %s): %s") % (status, (body or "")[:500])
+            for rec in self:
+                rec._mark_failed(settings, error, status=status, body=body, duration=duration,
+                                 error_type="UnrecognizedBatchResponse")
+            return
+
+        for rec, item in zip(self, results):
+            item_body = json.dumps(item)
+            if item is None:
+                rec._mark_failed(settings, _("El lote no devolvió resultado para este documento."),
+                                 status=status, duration=duration, error_type="MissingBatchItem")
+            elif rejected_item(item):
+                rec._mark_failed(settings, str(item.get("error") or item_body), status=status,
+                                 body=item_body, duration=duration, error_type="RejectedBatchItem")
+            else:
+                rec._mark_done(settings, status, item_body, duration=duration)
+
+    def _log_entry(self, ok, status, body, duration, error_type=None):
+        return {
+            "source": "invoice",
+            "move_id": self.move_id.id,
+            "outbox_id": self.id,
+            "ok": ok,
+            "status_code": status or 0,
+            "duration_ms": int(duration * 1000),
+            "payload_hash": self.payload_hash,
+            "error_type": error_type,
+            "body": body,
+        }
+
+    def _mark_done(self, settings, status, body, duration=0.0):
+        self.ensure_one()
+        self.write({
+            "attempts": self.attempts + 1,
+            "state": "done",
+            "last_status": status,
+            "last_response": body,
+            "last_error": False,
+        })
+        # Remember what GAS acknowledged, to never send the same document twice
+        self.move_id.sudo().write({
+            "clocky_fe_sent_hash": self.payload_hash,
+            "clocky_fe_last_response": body,
+        })
+        self.move_id._clocky_set_fe_state("sent")
+        settings["logs"].append(self._log_entry(True, status, body, duration))
+
+    def _mark_failed(self, settings, error, status=None, body=None, duration=0.0, error_type=None):
+        self.ensure_one()
+        if error_type == transport.CircuitOpenError.__name__:
+            # Not sent (GAS known to be down): wait for the breaker probe
+            attempts, failed = self.attempts, False
+            delay = timedelta(seconds=settings["breaker_cooldown"])
+        else:
+            attempts = self.attempts + 1
+            failed = attempts >= settings["max_attempts"]
+            delay = self._retry_delay(attempts)
+        self.write({
+            "attempts": attempts,
+            "state": "failed" if failed else "pending",
+            "next_attempt": fields.Datetime.now() + delay,
+            "last_status": status,
+            "last_error": error,
+        })
+        _logger.warning("Clocky FE outbox %s: send attempt %s failed: %s", self.id, attempts, error)
+        self.move_id._clocky_set_fe_state("failed" if failed else "retrying")
+        settings["logs"].append(self._log_entry(False, status, body or error, duration, error_type or "Error"))
+
+    # ---------- Actions ----------
+
+    def action_retry(self):
+        """Put failed records back in the queue for an immediate retry."""
+        self.write({
+            "state": "pending",
+            "attempts": 0,
+            "next_attempt": fields.Datetime.now(),
+        })
+        self._trigger_cron()
+        return True
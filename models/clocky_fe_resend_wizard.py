@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky FE Bulk Resend Wizard
+Description:
+    Sends a selection of invoices to GAS right away (action "Reenviar FE" on
+    the invoice list), e.g. to catch up after a GAS outage without waiting for
+    the outbox cron or opening the invoices one at a time.
+
+    The selected invoices are enqueued in `clocky.fe.outbox` (their pending
+    records are reused) and sent with `_send(concurrency=...)`: the POSTs run
+    in a bounded thread pool, while all the database work stays on the
+    request cursor. Records locked by a running cron are left to the cron.
+    The selection is sent in chunks, each committed as soon as it has been
+    sent: if the request is cut short (worker timeout), the documents
+    already acknowledged by GAS stay marked as sent and are not sent again.
+    The wizard ends with a summary (sent / retrying / failed / skipped).
+
+Recommended System Parameters:
+    - clocky.resend_concurrency     (default number of parallel POSTs, default 4)
+"""
+
+import threading
+import time
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+MAX_CONCURRENCY = 16
+# Minimum outbox records sent per committed chunk
+COMMIT_CHUNK_SIZE = 50
+
+
+class ClockyFeResendWizard(models.TransientModel):
+    _name = "clocky.fe.resend.wizard"
+    _description = "Reenvío masivo FE (Clocky)"
+
+    move_ids = fields.Many2many("account.move", string="Facturas")
+    concurrency = fields.Integer(
+        string="Envíos en paralelo", default=lambda self: self._default_concurrency(),
+        help="Número máximo de POST simultáneos al GAS (1 = secuencial).",
+    )
+    force = fields.Boolean(
+        string="Reenviar sin cambios",
+        help="Reenviar también las facturas ya aceptadas por el GAS con el mismo contenido.",
+    )
+    state = fields.Selection([("draft", "Borrador"), ("done", "Terminado")], default="draft")
+    sent_count = fields.Integer(string="Enviadas", readonly=True)
+    retry_count = fields.Integer(string="En reintento", readonly=True)
+    failed_count = fields.Integer(string="Fallidas", readonly=True)
+    skipped_count = fields.Integer(string="Omitidas", readonly=True)
+    busy_count = fields.Integer(string="En proceso por el cron", readonly=True)
+    duration = fields.Float(string="Duración (s)", readonly=True, digits=(16, 1))
+
+    @api.model
+    def _default_concurrency(self):
+        return self.env["clocky.settings"]._get("resend_concurrency")
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if "move_ids" in fields_list and self.env.context.get("active_model") == "account.move":
+            moves = self.env["account.move"].browse(self.env.context.get("active_ids") or [])
+            res["move_ids"] = [(6, 0, moves._clocky_filter_sendable().ids)]
+        return res
+
+    def action_send(self):
+        self.ensure_one()
+        moves = self.move_ids._clocky_filter_sendable()
+        if not moves:
+            raise UserError(_("Ninguna de las facturas seleccionadas es una factura de cliente publicada."))
+        concurrency = min(max(self.concurrency, 1), MAX_CONCURRENCY)
+
+        start = time.perf_counter()
+        outbox_model = self.env["clocky.fe.outbox"]
+        created = outbox_model._enqueue_moves(moves, force=self.force)
+        pending = outbox_model.sudo().search([
+            ("move_id", "in", (moves - created.move_id).ids),
+            ("state", "=", "pending"),
+        ])
+        candidates = created | pending
+        batch_size = max(self.env["clocky.settings"]._get("facturar_batch_size"), 1)
+        chunk_size = max(COMMIT_CHUNK_SIZE, batch_size * concurrency)
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        outbox = outbox_model.sudo()
+        for chunk in split_every(chunk_size, candidates.ids, candidates.browse):
+            locked = chunk._lock_for_send()
+            locked._send(concurrency=concurrency)
+            outbox |= locked
+            if auto_commit:
+                self.env.cr.commit()
+
+        states = outbox.mapped("state")
+        self.write({
+            "state": "done",
+            "sent_count": states.count("done"),
+            "retry_count": states.count("pending"),
+            "failed_count": states.count("failed"),
+            "skipped_count": len(moves) - len(candidates.move_id),
+            "busy_count": len(candidates) - len(outbox),
+            "duration": time.perf_counter() - start,
+        })
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
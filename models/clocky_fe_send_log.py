@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky FE Send Log
+Description:
+    Compact log of every POST sent to GAS (invoice outbox and POS), kept out
+    of the chatter: one small row per attempt with the outcome, the duration,
+    the payload hash and the response body truncated and zlib-compressed.
+
+    The invoice chatter only receives a tracking message when the FE state of
+    the invoice changes (see `account.move.clocky_fe_state`).
+
+    Old rows are removed by a daily cron (retention in days and/or a maximum
+    number of rows), in chunks.
+
+Recommended System Parameters:
+    - clocky.send_log_keep_forever     ('1'/'true' to never purge by age)
+    - clocky.send_log_retention_days   (default 30)
+    - clocky.send_log_max_rows         (default 0 = unlimited)
+    - clocky.send_log_body_limit       (bytes of response kept, default 4096)
+"""
+
+import base64
+import threading
+import zlib
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+GC_CHUNK = 10000
+
+
+class ClockyFeSendLog(models.Model):
+    _name = "clocky.fe.send.log"
+    _description = "Registro de envíos FE (Clocky)"
+    _order = "id desc"
+    _log_access = False
+
+    date = fields.Datetime(string="Fecha", default=fields.Datetime.now, required=True, index=True, readonly=True)
+    source = fields.Selection(
+        [("invoice", "Factura"), ("pos", "POS")],
+        string="Origen", required=True, readonly=True,
+    )
+    move_id = fields.Many2one("account.move", string="Factura", index="btree_not_null", ondelete="cascade", readonly=True)
+    pos_order_id = fields.Many2one("pos.order", string="Pedido POS", index="btree_not_null", ondelete="cascade", readonly=True)
+    outbox_id = fields.Many2one("clocky.fe.outbox", string="Cola", ondelete="set null", readonly=True)
+    ok = fields.Boolean(string="OK", readonly=True)
+    status_code = fields.Integer(string="Status HTTP", readonly=True)
+    duration_ms = fields.Integer(string="Duración (ms)", readonly=True)
+    payload_hash = fields.Char(string="Hash del payload", readonly=True)
+    error_type = fields.Char(string="Tipo de error", readonly=True)
+    body_zip = fields.Binary(string="Respuesta (comprimida)", attachment=False, readonly=True)
+    body_preview = fields.Text(string="Respuesta", compute="_compute_body_preview")
+
+    @api.depends("body_zip")
+    def _compute_body_preview(self):
+        for log in self:
+            if not log.body_zip:
+                log.body_preview = False
+                continue
+            try:
+                log.body_preview = zlib.decompress(base64.b64decode(log.body_zip)).decode("utf-8", errors="replace")
+            except (ValueError, zlib.error):
+                log.body_preview = False
+
+    @api.model
+    def _compress_body(self, body):
+        """Truncate `body` to `clocky.send_log_body_limit` bytes and compress it."""
+        if not body:
+            return False
+        limit = self.env["clocky.settings"]._get("send_log_body_limit")
+        data = body.encode("utf-8", errors="replace")[:limit]
+        return base64.b64encode(zlib.compress(data, 6))
+
+    @api.model
+    def _log_sends(self, entries):
+        """Create the log rows of `entries` (dicts, with a raw `body` key) in one batch."""
+        vals_list = []
+        for entry in entries:
+            vals = dict(entry)
+            vals["body_zip"] = self._compress_body(vals.pop("body", None))
+            vals_list.append(vals)
+        return self.sudo().create(vals_list)
+
+    @api.model
+    def _cron_gc_send_log(self):
+        """Apply the retention policy, deleting old rows in chunks.
+
+        Rows older than `clocky.send_log_retention_days` are removed unless
+        `clocky.send_log_keep_forever` is set; `clocky.send_log_max_rows`
+        (0 = unlimited) caps the table whatever the age of the rows.
+        """
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        settings = self.env["clocky.settings"]._get_all()
+        retention_days = 0 if settings["send_log_keep_forever"] else settings["send_log_retention_days"]
+        max_rows = settings["send_log_max_rows"]
+
+        queries = []
+        if retention_days > 0:
+            limit_date = fields.Datetime.now() - timedelta(days=retention_days)
+            queries.append((
+                "SELECT id FROM clocky_fe_send_log WHERE date < %s LIMIT %s",
+                [limit_date, GC_CHUNK],
+            ))
+        if max_rows > 0:
+            queries.append((
+                "SELECT id FROM clocky_fe_send_log ORDER BY id DESC OFFSET %s LIMIT %s",
+                [max_rows, GC_CHUNK],
+            ))
+
+        for query, params in queries:
+            while True:
+                self.env.cr.execute(query, params)
+                ids = [row[0] for row in self.env.cr.fetchall()]
+                if not ids:
+                    break
+                self.env.cr.execute("DELETE FROM clocky_fe_send_log WHERE id = ANY(%s)", [ids])
+                if auto_commit:
+                    self.env.cr.commit()
+        self.invalidate_model()
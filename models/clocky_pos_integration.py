@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import json
+import time
 import traceback
-import urllib.request
-import urllib.error
 
 from odoo import api, models
+from odoo.tools import split_every
+
+from ..tools import metrics, transport
+from .clocky_fe_outbox import map_batch_results, payload_hash, rejected_item
 
 
 class ClockyPosIntegration(models.Model):
@@ -18,101 +21,347 @@ class ClockyPosIntegration(models.Model):
         Recibe el payload de la venta de POS (desde JS) y
         lo envía por HTTP POST al Web App de Google Apps Script (GAS).
 
+        `payload` también puede ser una lista de payloads (buffer offline del
+        POS): en ese caso se devuelve una lista de resultados en el mismo orden
+        y, si `clocky.facturar_batch_size` > 1, se envían en lotes (un POST
+        con un arreglo JSON por lote).
+
         Retorna un dict tipo:
         {
             "ok": True/False,
             "status": <código HTTP o None>,
             "response": <JSON parseado o texto crudo>,
-            "error": <mensaje en caso de fallo>
+            "error": <mensaje en caso de fallo>,
+            "cached": True si la venta ya había sido aceptada con el mismo
+                      contenido y no se volvió a enviar
         }
         """
+        payloads = payload if isinstance(payload, list) else [payload]
 
         # 1) Leer parámetros del sistema para la URL y el token
-        icp = self.env["ir.config_parameter"].sudo()
+        settings = self._clocky_pos_settings()
+        if not settings["url"]:
+            error = self._clocky_result_error(
+                "No hay URL configurada en 'clocky.pos_post_url' "
+                "ni en 'clocky.facturar_post_url'.",
+                error_type="MissingUrl",
+            )
+            results = [dict(error) for _p in payloads]
+        else:
+            results = [None] * len(payloads)
+            invalid = self._clocky_invalid_cabys_payloads(payloads)
+            for index, codes in invalid.items():
+                results[index] = self._clocky_cabys_error(codes)
+            todo = [index for index in range(len(payloads)) if index not in invalid]
+            sent = self._clocky_post_payloads([payloads[index] for index in todo], settings)
+            for index, result in zip(todo, sent):
+                results[index] = result
 
-        # Puedes configurar clocky.pos_post_url específicamente para POS,
-        # o reusar clocky.facturar_post_url si ya lo tienes configurado.
-        url = (
-            (icp.get_param("clocky.pos_post_url") or "")
-            or (icp.get_param("clocky.facturar_post_url") or "")
-        ).strip()
-
-        token = (
-            (icp.get_param("clocky.pos_post_token") or "")
-            or (icp.get_param("clocky.facturar_post_token") or "")
-        ).strip()
-
-        if not url:
-            return {
-                "ok": False,
-                "status": None,
-                "response": None,
-                "error": (
-                    "No hay URL configurada en 'clocky.pos_post_url' "
-                    "ni en 'clocky.facturar_post_url'."
-                ),
-            }
+        return results if isinstance(payload, list) else results[0]
 
-        # 2) Serializar el payload a JSON
-        try:
-            data = json.dumps(payload).encode("utf-8")
-        except Exception as e:
-            return {
-                "ok": False,
+    @api.model
+    def clocky_pos_send_orders(self, references):
+        """
+        Envía al GAS las ventas POS ya sincronizadas, identificadas por su
+        referencia (`pos_reference`, el nombre de la orden en el POS).
+
+        El payload se construye en el servidor, en lote, a partir de los
+        `pos.order` (`_clocky_build_payloads`): el navegador solo envía las
+        referencias. Retorna una lista de resultados en el mismo orden
+        (misma forma que `clocky_pos_post_to_gas`); una referencia que aún no
+        llega al servidor (POS sin conexión) devuelve un error para que el
+        buffer del POS la reintente, y una venta facturada se omite
+        (``"skipped": "invoiced"``).
+        """
+        orders = self._clocky_find_pos_orders([{"orden": ref} for ref in references])
+        missing = self._clocky_result_error(
+            "La venta aún no está sincronizada con el servidor.", error_type="OrderNotSynced",
+        )
+        results = [dict(missing) for _ref in references]
+        found = [(index, orders[ref]) for index, ref in enumerate(references) if ref in orders]
+        if found:
+            order_records = self.env["pos.order"].sudo().browse([order.id for _index, order in found])
+            sent = self._clocky_send_order_records(order_records)
+            for (index, _order), result in zip(found, sent):
+                results[index] = result
+        return results
+
+    @api.model
+    def _clocky_send_order_records(self, orders):
+        """Construir en lote los payloads de `orders` y enviarlos al GAS.
+
+        Las ventas facturadas (`account_move`) no se envían: su comprobante
+        sale por la cola de facturas (`clocky.fe.outbox`), igual que en el
+        cron de envío diferido. Las ventas con códigos CABYS fuera del
+        catálogo tampoco, y no reciben número de Hacienda.
+
+        Retorna un resultado por venta, en el orden de `orders`.
+        """
+        settings = self._clocky_pos_settings()
+        if not settings["url"]:
+            error = self._clocky_result_error(
+                "No hay URL configurada en 'clocky.pos_post_url' "
+                "ni en 'clocky.facturar_post_url'.",
+                error_type="MissingUrl",
+            )
+            return [dict(error) for _order in orders]
+        results = {}
+        for order in orders.filtered("account_move"):
+            results[order.id] = {
+                "ok": True,
                 "status": None,
                 "response": None,
-                "error": "Error serializando payload a JSON en servidor: %s" % e,
+                "error": None,
+                "cached": True,
+                "skipped": "invoiced",
             }
+        todo = orders.filtered(lambda o: not o.account_move)
+        invalid = todo._clocky_invalid_cabys()
+        for order_id, codes in invalid.items():
+            results[order_id] = self._clocky_cabys_error(codes)
+        todo = todo.filtered(lambda o: o.id not in invalid)
+        # Solo las ventas que el GAS nunca aceptó reciben número de Hacienda
+        todo.filtered(lambda o: not o.clocky_fe_sent_hash)._clocky_assign_fe_numbers()
+        payloads = todo._clocky_build_payloads()
+        sent = self._clocky_post_payloads([payloads[order.id] for order in todo], settings)
+        results.update(zip(todo.ids, sent))
+        return [results[order.id] for order in orders]
+
+    @api.model
+    def _clocky_pos_settings(self):
+        # Parámetros en caché (clocky.settings): sin lecturas por venta
+        params = self.env["clocky.settings"]._get_all()
+
+        # Puedes configurar clocky.pos_post_url específicamente para POS,
+        # o reusar clocky.facturar_post_url si ya lo tienes configurado.
+        url = params["pos_post_url"] or params["facturar_post_url"]
+        token = params["pos_post_token"] or params["facturar_post_token"]
 
-        # 3) Construir headers y request hacia GAS
         headers = {"Content-Type": "application/json"}
         if token:
             headers["Authorization"] = f"Bearer {token}"
 
-        req = urllib.request.Request(
-            url,
-            data=data,
-            headers=headers,
-            method="POST",
-        )
+        return {
+            "url": url,
+            "headers": headers,
+            "options": transport.options_from_settings(params, read_timeout=30, stage="pos.http_send"),
+            "batch_size": max(params["facturar_batch_size"], 1),
+        }
 
-        # 4) Hacer la llamada HTTP
+    @api.model
+    def _clocky_post_payloads(self, payloads, settings):
+        """Enviar `payloads` al GAS y devolver un resultado por payload (mismo orden)."""
+        results = [None] * len(payloads)
+        orders = self._clocky_find_pos_orders(payloads)
+
+        # 2) Serializar + idempotencia: si la venta ya fue aceptada con este
+        #    mismo contenido, no se vuelve a enviar y se devuelve la respuesta guardada
+        #    (el cuerpo del POST se serializa por partes al enviarlo, ver `_clocky_http_post`)
+        todo = []
+        for index, payload in enumerate(payloads):
+            try:
+                with metrics.timed("pos.serialize"):
+                    digest = payload_hash(payload)
+            except Exception as e:
+                results[index] = self._clocky_result_error(
+                    "Error serializando payload a JSON en servidor: %s" % e,
+                    error_type="SerializationError",
+                )
+                continue
+            order = orders.get(payload.get("orden")) if isinstance(payload, dict) else None
+            if order and order.clocky_fe_sent_hash == digest:
+                results[index] = {
+                    "ok": True,
+                    "status": None,
+                    "response": self._clocky_parse_body(order.clocky_fe_last_response),
+                    "error": None,
+                    "cached": True,
+                }
+                continue
+            todo.append((index, payload, digest, order))
+
+        # 3) Un POST por venta, o un POST por lote en modo batch.
+        #    Cada intento queda en clocky.fe.send.log (una sola inserción al final)
+        logs = []
         try:
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                status = resp.getcode()
-                body = resp.read().decode("utf-8")
-        except urllib.error.HTTPError as he:
-            return {
-                "ok": False,
-                "status": getattr(he, "code", None),
-                "response": None,
-                "error": "HTTPError hacia GAS: %s" % he,
-            }
-        except urllib.error.URLError as ue:
-            return {
-                "ok": False,
-                "status": None,
-                "response": None,
-                "error": "URLError hacia GAS: %s" % ue,
+            if settings["batch_size"] <= 1:
+                self._clocky_post_single(todo, settings, results, logs)
+            else:
+                self._clocky_post_batches(todo, settings, results, logs)
+        finally:
+            if logs:
+                self.env["clocky.fe.send.log"]._log_sends(logs)
+        return results
+
+    @api.model
+    def _clocky_post_single(self, todo, settings, results, logs):
+        for index, payload, digest, order in todo:
+            start = time.perf_counter()
+            status, body, error = self._clocky_http_post(payload, settings)
+            duration = time.perf_counter() - start
+            if not error:
+                response = self._clocky_parse_body(body)
+                # Un 200 también puede traer {"ok": false, "error": ...}
+                if rejected_item(response):
+                    error = self._clocky_result_error(
+                        str(response.get("error") or body), status=status,
+                        response=response, error_type="RejectedBatchItem",
+                    )
+            logs.append(self._clocky_log_entry(order, digest, status, body, duration, error))
+            if error:
+                results[index] = error
+                continue
+            self._clocky_remember_sent(order, digest, body)
+            results[index] = {
+                "ok": True,
+                "status": status,
+                "response": response,
+                "error": None,
             }
+
+    @api.model
+    def _clocky_post_batches(self, todo, settings, results, logs):
+        for chunk in split_every(settings["batch_size"], todo):
+            batch = [item[1] for item in chunk]
+            start = time.perf_counter()
+            status, body, error = self._clocky_http_post(batch, settings)
+            duration = time.perf_counter() - start
+            items = None
+            if not error:
+                with metrics.timed("pos.response_parse"):
+                    items = map_batch_results(batch, body)
+            if items is None:
+                if not error:
+                    metrics.count_error("pos.response_parse", "UnrecognizedBatchResponse")
+                error = error or self._clocky_result_error(
+                    "Respuesta de lote no reconocida: %s" % (body or "")[:500], status=status,
+                    error_type="UnrecognizedBatchResponse",
+                )
+                for index, _payload, digest, order in chunk:
+                    results[index] = dict(error)
+                    logs.append(self._clocky_log_entry(order, digest, status, body, duration, error))
+                continue
+            for (index, _payload, digest, order), item in zip(chunk, items):
+                if item is None or rejected_item(item):
+                    results[index] = self._clocky_result_error(
+                        str((item or {}).get("error") or "El lote no devolvió resultado para esta venta."),
+                        status=status, response=item, error_type="RejectedBatchItem",
+                    )
+                    logs.append(self._clocky_log_entry(
+                        order, digest, status, json.dumps(item), duration, results[index],
+                    ))
+                    continue
+                item_body = json.dumps(item)
+                self._clocky_remember_sent(order, digest, item_body)
+                logs.append(self._clocky_log_entry(order, digest, status, item_body, duration))
+                results[index] = {"ok": True, "status": status, "response": item, "error": None}
+
+    @api.model
+    def _clocky_http_post(self, payload, settings):
+        """Hacer la llamada HTTP (cliente keep-alive compartido con las facturas).
+
+        `payload` (una venta, o la lista de un lote) se codifica como JSON
+        compacto directamente en el cuerpo de la petición (`transport.post_json`),
+        por partes si el envío es chunked/gzip.
+
+        Retorna ``(status, body, error)``, donde `error` es un resultado de
+        error listo para devolver al POS, o None si el envío fue correcto.
+        """
+        try:
+            with metrics.timed("pos.http_send"):
+                status, body = transport.post_json(
+                    settings["url"], payload, headers=settings["headers"], **settings["options"]
+                )
+        except transport.HTTPStatusError as he:
+            return he.status, he.body, self._clocky_result_error(
+                "HTTPError hacia GAS: %s" % he, status=he.status, error_type=he.__class__.__name__,
+            )
+        except transport.TransportError as ue:
+            return None, None, self._clocky_result_error(
+                "URLError hacia GAS: %s" % ue, error_type=ue.__class__.__name__,
+            )
         except Exception as e:
             tb = traceback.format_exc()
-            return {
-                "ok": False,
-                "status": None,
-                "response": None,
-                "error": "Error general hacia GAS: %s\n%s" % (e, tb),
-            }
+            return None, None, self._clocky_result_error(
+                "Error general hacia GAS: %s\n%s" % (e, tb), error_type=e.__class__.__name__,
+            )
+        return status, body, None
 
-        # 5) Intentar parsear la respuesta como JSON
-        try:
-            parsed = json.loads(body)
-        except Exception:
-            parsed = {"raw": body}
+    @api.model
+    def _clocky_log_entry(self, order, digest, status, body, duration, error=None):
+        """Fila de clocky.fe.send.log para un intento de envío de una venta."""
+        return {
+            "source": "pos",
+            "pos_order_id": order.id if order else False,
+            "ok": not error,
+            "status_code": status or 0,
+            "duration_ms": int(duration * 1000),
+            "payload_hash": digest,
+            "error_type": (error.get("error_type") or "Error") if error else None,
+            "body": body or (error and error["error"]),
+        }
 
+    @api.model
+    def _clocky_invalid_cabys_payloads(self, payloads):
+        """Retornar {índice: [códigos]} de los payloads con CABYS fuera del catálogo."""
+        catalog = self.env["clocky.cabys.catalog"]
+        if not catalog._clocky_valid_codes():
+            return {}
+        invalid = {}
+        for index, payload in enumerate(payloads):
+            lines = ((payload.get("invoice") or {}).get("lines") or []) if isinstance(payload, dict) else []
+            codes = {line.get("cabys") for line in lines if isinstance(line, dict) and line.get("cabys")}
+            bad = catalog._clocky_invalid_codes(codes)
+            if bad:
+                invalid[index] = bad
+        return invalid
+
+    @api.model
+    def _clocky_cabys_error(self, codes):
+        return self._clocky_result_error(
+            "Códigos CABYS que no existen en el catálogo: %s" % ", ".join(codes),
+            error_type="InvalidCabys",
+        )
+
+    @api.model
+    def _clocky_result_error(self, error, status=None, response=None, error_type=None):
         return {
-            "ok": True,
+            "ok": False,
             "status": status,
-            "response": parsed,
-            "error": None,
+            "response": response,
+            "error": error,
+            "error_type": error_type,
         }
+
+    @api.model
+    def _clocky_remember_sent(self, order, digest, body):
+        """Guardar en el pos.order el envío aceptado (ver `clocky_fe_sent_hash`)."""
+        if order:
+            order.write({
+                "clocky_fe_sent_hash": digest,
+                "clocky_fe_last_response": body,
+            })
+
+    @api.model
+    def _clocky_find_pos_orders(self, payloads):
+        """Buscar los pos.order sincronizados de los payloads, por su referencia.
+
+        Retorna un dict {referencia: pos.order} (una sola búsqueda para todo el lote).
+        """
+        references = [
+            p.get("orden") for p in payloads if isinstance(p, dict) and p.get("orden")
+        ]
+        if not references:
+            return {}
+        orders = self.env["pos.order"].sudo().search([("pos_reference", "in", references)])
+        return {order.pos_reference: order for order in orders}
+
+    @api.model
+    def _clocky_parse_body(self, body):
+        start = time.perf_counter()
+        try:
+            parsed = json.loads(body)
+        except Exception:
+            parsed = {"raw": body}
+        metrics.observe("pos.response_parse", time.perf_counter() - start)
+        return parsed
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky Settings
+Description:
+    Typed, cached access to the `clocky.*` system parameters.
+
+    All the parameters are read in one query and parsed once (bool / int /
+    float / str, with their defaults) into an immutable mapping cached per
+    registry (ormcache). `ir.config_parameter` clears the registry caches on
+    every create/write/unlink, so a changed parameter is seen by the next
+    call, in every worker.
+
+        settings = self.env["clocky.settings"]._get_all()
+        settings["facturar_post_url"]
+
+    Booleans accept '1', 'true', 'yes' and 'on' (any case); anything else,
+    including an unset parameter, is False. Unparsable numbers fall back to
+    their default. The parameters are editable in Settings > Invoicing >
+    Clocky FE (see `res.config.settings`).
+
+    Settings stores a numeric field left at 0 as an unset parameter, which
+    reads back as its default: a feature that can be switched off has its
+    own boolean parameter, off when unset (e.g. `clocky.breaker_disabled`).
+"""
+
+from odoo import api, models, tools
+from odoo.tools import frozendict
+
+# name: (system parameter, type, default)
+CLOCKY_PARAMS = {
+    # Endpoints
+    "facturar_post_url": ("clocky.facturar_post_url", "str", ""),
+    "facturar_post_token": ("clocky.facturar_post_token", "str", ""),
+    "pos_post_url": ("clocky.pos_post_url", "str", ""),
+    "pos_post_token": ("clocky.pos_post_token", "str", ""),
+    "facturar_block_on_fail": ("clocky.facturar_block_on_fail", "bool", False),
+    "facturar_batch_size": ("clocky.facturar_batch_size", "int", 1),
+    # Hacienda numbering (see clocky.fe.numbering)
+    "fe_local_numbering": ("clocky.fe_local_numbering", "bool", False),
+    "fe_sucursal": ("clocky.fe_sucursal", "str", "001"),
+    "fe_punto": ("clocky.fe_punto", "str", "00001"),
+    "fe_situacion": ("clocky.fe_situacion", "str", "1"),
+    # Hacienda status polling
+    "fe_status_url": ("clocky.fe_status_url", "str", ""),
+    "status_poll_limit": ("clocky.status_poll_limit", "int", 500),
+    "status_batch_size": ("clocky.status_batch_size", "int", 100),
+    # Outbox
+    "outbox_batch_limit": ("clocky.outbox_batch_limit", "int", 100),
+    "outbox_max_attempts": ("clocky.outbox_max_attempts", "int", 8),
+    "outbox_retry_base": ("clocky.outbox_retry_base", "int", 60),
+    "outbox_retry_max": ("clocky.outbox_retry_max", "int", 6 * 3600),
+    "resend_concurrency": ("clocky.resend_concurrency", "int", 4),
+    # POS tickets sent in batches (pos.config.clocky_fe_send_mode)
+    "pos_flush_limit": ("clocky.pos_flush_limit", "int", 2000),
+    # HTTP transport (read timeout: None = default of each sender)
+    "http_connect_timeout": ("clocky.http_connect_timeout", "float", 10.0),
+    "http_read_timeout": ("clocky.http_read_timeout", "float", None),
+    "http_gzip": ("clocky.http_gzip", "bool", False),
+    "http_chunked": ("clocky.http_chunked", "bool", False),
+    "http_timeout_fixed": ("clocky.http_timeout_fixed", "bool", False),
+    "http_timeout_factor": ("clocky.http_timeout_factor", "float", 3.0),
+    "http_timeout_floor": ("clocky.http_timeout_floor", "float", 5.0),
+    # Circuit breaker (per host and process)
+    "breaker_disabled": ("clocky.breaker_disabled", "bool", False),
+    "breaker_failures": ("clocky.breaker_failures", "int", 5),
+    "breaker_cooldown": ("clocky.breaker_cooldown", "float", 30.0),
+    # Send log
+    "send_log_keep_forever": ("clocky.send_log_keep_forever", "bool", False),
+    "send_log_retention_days": ("clocky.send_log_retention_days", "int", 30),
+    "send_log_max_rows": ("clocky.send_log_max_rows", "int", 0),
+    "send_log_body_limit": ("clocky.send_log_body_limit", "int", 4096),
+    # UI / monitoring
+    "preview_page_size": ("clocky.preview_page_size", "int", 100),
+    "metrics_token": ("clocky.metrics_token", "str", ""),
+}
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _parse(value, kind, default):
+    value = (value or "").strip()
+    if kind == "bool":
+        return value.lower() in _TRUE_VALUES
+    if not value:
+        return default
+    if kind == "str":
+        return value
+    try:
+        return int(value) if kind == "int" else float(value)
+    except ValueError:
+        return default
+
+
+class ClockySettings(models.AbstractModel):
+    _name = "clocky.settings"
+    _description = "Parámetros Clocky FE"
+
+    @api.model
+    @tools.ormcache()
+    def _get_all(self):
+        """Return the parsed `clocky.*` parameters (immutable mapping, cached)."""
+        self.env.cr.execute(
+            "SELECT key, value FROM ir_config_parameter WHERE key IN %s",
+            [tuple(param for param, _kind, _default in CLOCKY_PARAMS.values())],
+        )
+        raw = dict(self.env.cr.fetchall())
+        return frozendict({
+            name: _parse(raw.get(param), kind, default)
+            for name, (param, kind, default) in CLOCKY_PARAMS.items()
+        })
+
+    @api.model
+    def _get(self, name):
+        return self._get_all()[name]
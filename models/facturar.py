@@ -4,25 +4,50 @@ Title: Invoice Preview Wizard (POST + Post)
 Description:
     Extends the invoice preview wizard to:
       1) Build a JSON payload with invoice data (header and lines including CABYS)
-      2) Send it via HTTP POST to a URL configured in System Parameters
-      3) (Optional) Log the POST result into the invoice chatter
+      2) Enqueue it in `clocky.fe.outbox`, whose cron sends it via HTTP POST
+         to a URL configured in System Parameters
+      3) Track the FE send state on the invoice (attempts in `clocky.fe.send.log`)
       4) Post (validate) the invoice
 
 Recommended System Parameters:
     - clocky.facturar_post_url
     - clocky.facturar_post_token        (optional, sent as Bearer)
     - clocky.facturar_block_on_fail     (optional: '1'/'true' to block on failure)
+    - clocky.preview_page_size          (invoice lines per preview page, default 100)
 """
 
-import json
-import ssl
 import traceback
 from datetime import date, datetime
-from urllib.request import Request, urlopen
-from urllib.error import URLError, HTTPError
 
-from odoo import api, fields, models, _
+from markupsafe import escape
+
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
+from odoo.tools import float_round
+
+from ..tools import metrics
+from .clocky_fe_numbering import DOC_TYPE_CREDIT_NOTE, DOC_TYPE_DEBIT_NOTE, DOC_TYPE_INVOICE
+
+# Typical field name variants seen in CR localizations/customizations, per
+# concept (in order of preference). Resolved once per registry, see
+# `AccountMove._clocky_resolve_fields`.
+CLOCKY_FIELD_CANDIDATES = {
+    # res.partner
+    "province": ("l10n_cr_province_id", "province_id", "state_id", "l10n_cr_province",
+                 "x_province_id", "x_province"),
+    "canton": ("county_id", "l10n_cr_canton_id", "canton_id", "l10n_cr_canton",
+               "x_canton_id", "x_canton"),
+    "district": ("district_id", "l10n_cr_district_id", "l10n_cr_district",
+                 "x_district_id", "x_district"),
+    "neighborhood": ("neighborhood_id", "l10n_cr_neighborhood_id", "l10n_cr_neighborhood",
+                     "x_neighborhood_id", "x_neighborhood", "barrio"),
+    # uom.uom
+    "uom_code": ("l10n_cr_unit_code", "code", "uom_code", "x_uom_code"),
+    # account.payment.term.line
+    "term_days": ("days", "nb_days", "delay"),
+    # account.tax
+    "tax_code": ("l10n_cr_tax_code", "tax_code", "x_tax_code", "x_codigo_impuesto"),
+}
 
 
 
@@ -43,7 +68,12 @@ class AccountInvoicePreviewWizard(models.TransientModel):
     amount_tax = fields.Monetary(string="Impuestos", readonly=True, currency_field="currency_id")
     amount_total = fields.Monetary(string="Total", readonly=True, currency_field="currency_id")
     currency_id = fields.Many2one("res.currency", string="Divisa interna", readonly=True)
-    lines_html = fields.Html(string="Líneas", readonly=True, sanitize=False)
+    # Preview paging: only the current page of lines is rendered (see `_compute_lines_html`)
+    page = fields.Integer(string="Página", default=1)
+    page_size = fields.Integer(string="Líneas por página", default=lambda self: self._default_page_size())
+    line_count = fields.Integer(string="Líneas", compute="_compute_line_count")
+    page_count = fields.Integer(string="Páginas", compute="_compute_page_count")
+    lines_html = fields.Html(string="Líneas", compute="_compute_lines_html", sanitize=False)
 
     @api.model
     def default_get(self, fields_list):
@@ -69,6 +99,49 @@ class AccountInvoicePreviewWizard(models.TransientModel):
             "amount_total": move.amount_total,
         })
 
+        return res
+
+    @api.model
+    def _default_page_size(self):
+        return max(self.env["clocky.settings"]._get("preview_page_size"), 1)
+
+    def _preview_line_domain(self):
+        # Same lines as `account.move.invoice_line_ids`
+        return [
+            ("move_id", "=", self.move_id.id),
+            ("display_type", "in", ("product", "line_section", "line_note")),
+        ]
+
+    @api.depends("move_id")
+    def _compute_line_count(self):
+        for wizard in self:
+            wizard.line_count = (
+                self.env["account.move.line"].search_count(wizard._preview_line_domain())
+                if wizard.move_id else 0
+            )
+
+    @api.depends("line_count", "page_size")
+    def _compute_page_count(self):
+        for wizard in self:
+            size = max(wizard.page_size, 1)
+            wizard.page_count = max((wizard.line_count + size - 1) // size, 1)
+
+    @api.depends("move_id", "page", "page_size")
+    def _compute_lines_html(self):
+        """Render only the current page of lines (not stored: never persisted in the transient table)."""
+        for wizard in self:
+            wizard.lines_html = wizard._render_lines_html()
+
+    def _render_lines_html(self):
+        self.ensure_one()
+        move = self.move_id
+        size = max(self.page_size, 1)
+        page = min(max(self.page, 1), self.page_count)
+        lines = self.env["account.move.line"].search(
+            self._preview_line_domain() if move else [("id", "=", 0)],
+            order="sequence, id", offset=(page - 1) * size, limit=size,
+        )
+
         # Monetary formatter for preview HTML
         def fmt(amount):
             amount = amount or 0.0
@@ -81,10 +154,10 @@ class AccountInvoicePreviewWizard(models.TransientModel):
 
         # Lines as HTML (includes CABYS)
         rows = []
-        for l in move.invoice_line_ids:
-            pname = l.product_id.display_name or (l.name or "")
-            taxes = ", ".join(t.name for t in l.tax_ids) or "-"
-            cabys = getattr(l, "cabys", "") or ""
+        for l in lines:
+            pname = escape(l.product_id.display_name or (l.name or ""))
+            taxes = escape(", ".join(t.name for t in l.tax_ids) or "-")
+            cabys = escape(l.cabys or "")
             qty = l.quantity or 0.0
             price_unit = l.price_unit or 0.0
             discount = l.discount or 0.0
@@ -103,7 +176,8 @@ class AccountInvoicePreviewWizard(models.TransientModel):
                 f"</tr>"
             )
 
-        table = (
+        empty_row = '<tr><td colspan="8">Sin líneas</td></tr>'
+        return (
             "<table class='table table-sm o_list_view' style='width:100%; border-collapse:collapse;'>"
             "<thead><tr>"
             "<th>Producto/Descripción</th>"
@@ -115,60 +189,267 @@ class AccountInvoicePreviewWizard(models.TransientModel):
             "<th style='text-align:right'>Subtotal</th>"
             "<th style='text-align:right'>Total</th>"
             "</tr></thead>"
-            f"<tbody>{''.join(rows) if rows else '<tr><td colspan=\"8\">Sin líneas</td></tr>'}</tbody>"
+            f"<tbody>{''.join(rows) if rows else empty_row}</tbody>"
             "</table>"
         )
-        res["lines_html"] = table
-        return res
 
-    # ---------- POST helpers ----------
+    # ---------- Paging ----------
+
+    def _reopen(self):
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+            "context": self.env.context,
+        }
+
+    def action_previous_page(self):
+        self.ensure_one()
+        self.page = max(self.page - 1, 1)
+        return self._reopen()
+
+    def action_next_page(self):
+        self.ensure_one()
+        self.page = min(self.page + 1, self.page_count)
+        return self._reopen()
+
+    def action_post_invoice(self):
+        """
+        Enqueue the invoice data for sending (see `clocky.fe.outbox`).
+        The POST itself is performed by a cron job, out of the user's request,
+        unless `clocky.facturar_block_on_fail` is set: in that case the POST is
+        sent right away and a failure blocks the operation.
+        """
+        self.ensure_one()
+        move = self.move_id
+        if move.state != "draft":
+            # 1) Parameters (cached, see `clocky.settings`)
+            block_on_fail = self.env["clocky.settings"]._get("facturar_block_on_fail")
+
+            # 2) Validate the CABYS codes against the catalog, build payload
+            #    & enqueue it in this same transaction
+            move._clocky_check_cabys()
+            try:
+                outbox = self.env["clocky.fe.outbox"]._enqueue_moves(move)
+            except Exception:
+                tb = traceback.format_exc()
+                # UI message kept in Spanish
+                raise UserError(_("Fallo construyendo el payload de la factura:\n%s") % tb)
+
+            # 3) Blocking mode: send now and refuse to continue on failure
+            if block_on_fail and outbox:
+                outbox._send()
+                if outbox.state != "done":
+                    # UI message kept in Spanish
+                    raise UserError(_("No fue posible notificar vía POST. Se ha bloqueado la contabilización.\n\nDetalle: %s") % outbox.last_error)
+
+            # 4) Re-open the now-posted invoice in form view
+            action = self.env["ir.actions.actions"]._for_xml_id("account.action_move_out_invoice_type")
+            action.update({
+                "view_mode": "form",
+                "res_id": move.id,
+                "target": "current",
+            })
+        else:
+            # UI message kept in Spanish
+            raise UserError(_("La factura no puede estar en borrador'."))
+        return action
+    
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    # Estado del envío FE: solo sus cambios se registran en el chatter (tracking);
+    # el detalle de cada intento queda en clocky.fe.send.log
+    clocky_fe_state = fields.Selection(
+        [
+            ("queued", "En cola"),
+            ("sent", "Enviada"),
+            ("retrying", "Reintentando"),
+            ("failed", "Envío fallido"),
+            ("invalid", "CABYS inválido"),
+            ("accepted", "Aceptada por Hacienda"),
+            ("rejected", "Rechazada por Hacienda"),
+        ],
+        string="Estado FE", readonly=True, copy=False, index=True, tracking=True,
+    )
+    # Último envío aceptado por el GAS (para no reenviar el mismo documento)
+    clocky_fe_sent_hash = fields.Char(string="Hash FE enviado", readonly=True, copy=False)
+    clocky_fe_last_response = fields.Text(string="Última respuesta FE", readonly=True, copy=False)
+    # Números de Hacienda asignados en Odoo (ver clocky.fe.numbering)
+    clocky_fe_consecutivo = fields.Char(string="Consecutivo FE", size=20, readonly=True, copy=False, index=True)
+    clocky_fe_clave = fields.Char(string="Clave FE", size=50, readonly=True, copy=False, index=True)
+
+    def action_open_facturar_wizard(self):
+        """
+        Encolar esta factura para enviarla a la API de facturación (misma lógica
+        de Facturar). El envío lo hace el cron de `clocky.fe.outbox`, así que el
+        botón responde de inmediato aunque el GAS esté lento.
+        """
+        moves = self.filtered(lambda m: m.move_type == "out_invoice")
+        if not moves:
+            return True
+
+        if not self.env["clocky.settings"]._get("facturar_post_url"):
+            # ventana de aviso si ni siquiera hay URL
+            raise UserError(
+                _(
+                    "Clocky FE POS\n\n"
+                    "No se ha configurado el parámetro del sistema "
+                    "<b>clocky.facturar_post_url</b>.\n\n"
+                    "Sin URL no se puede enviar nada al GAS."
+                )
+            )
+
+        moves._clocky_check_cabys()
+        queued = self.env["clocky.fe.outbox"]._enqueue_moves(moves).move_id
+
+        # Facturas sin cambios desde el último envío aceptado (o ya en cola)
+        skipped = len(moves) - len(queued)
+        message = _("%s factura(s) encolada(s) para envío.") % len(queued)
+        if skipped:
+            message += " " + _("%s sin cambios desde el último envío, se omiten.") % skipped
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Factura electrónica"),
+                "message": message,
+                "type": "success",
+                "sticky": False,
+            },
+        }
+
+    def clocky_send_fe_from_pos(self):
+        """Encolar las facturas generadas desde el POS (llamado por `pos.order`)."""
+        return self.env["clocky.fe.outbox"]._enqueue_moves(self._clocky_filter_sendable())
+
+    def _clocky_filter_sendable(self):
+        """Customer invoices that can be sent to GAS (posted `out_invoice`)."""
+        return self.filtered(lambda m: m.move_type == "out_invoice" and m.state == "posted")
+
+    def _clocky_invalid_cabys(self):
+        """Return {move_id: [codes]} of the product lines whose CABYS is not in the catalog.
+
+        Empty while `clocky.cabys.catalog` has not been imported.
+        """
+        catalog = self.env["clocky.cabys.catalog"]
+        if not catalog._clocky_valid_codes():
+            return {}
+        codes = {}
+        for line in self.invoice_line_ids:
+            if line.display_type == "product" and line.cabys:
+                codes.setdefault(line.move_id.id, set()).add(line.cabys)
+        invalid = {}
+        for move_id, move_codes in codes.items():
+            bad = catalog._clocky_invalid_codes(move_codes)
+            if bad:
+                invalid[move_id] = bad
+        return invalid
+
+    def _clocky_check_cabys(self):
+        """Raise a UserError listing the CABYS codes of `self` that are not in the catalog."""
+        invalid = self._clocky_invalid_cabys()
+        if invalid:
+            details = "\n".join(
+                "%s: %s" % (move.display_name, ", ".join(invalid[move.id]))
+                for move in self.browse(list(invalid))
+            )
+            raise UserError(_("Códigos CABYS que no existen en el catálogo:\n%s") % details)
+
+    def _clocky_reject_invalid_cabys(self):
+        """Flag the moves with unknown CABYS codes as ``invalid`` and return the others."""
+        invalid = self._clocky_invalid_cabys()
+        if not invalid:
+            return self
+        rejected = self.browse(list(invalid))
+        for move in rejected.filtered(lambda m: m.clocky_fe_state != "invalid"):
+            move.sudo().message_post(
+                body=_("Clocky FE: no se envía, códigos CABYS fuera del catálogo: %s")
+                % ", ".join(invalid[move.id]),
+                subtype_xmlid="mail.mt_note",
+            )
+        rejected._clocky_set_fe_state("invalid")
+        return self - rejected
+
+    def _clocky_fe_doc_type(self):
+        """Hacienda document type of the move (01 invoice, 02 debit note, 03 credit note)."""
+        self.ensure_one()
+        if self.move_type == "out_refund":
+            return DOC_TYPE_CREDIT_NOTE
+        if "debit_origin_id" in self._fields and self.debit_origin_id:
+            return DOC_TYPE_DEBIT_NOTE
+        return DOC_TYPE_INVOICE
+
+    def _clocky_assign_fe_numbers(self):
+        """Allocate the consecutivo / clave of the moves that have none (see `clocky.fe.numbering`).
+
+        Invoices issued from a POS use the sucursal / punto of their POS.
+        """
+        numbering = self.env["clocky.fe.numbering"]
+        default_branch = numbering._default_branch()
+        has_pos = "pos_order_ids" in self._fields
+
+        def key_of(move):
+            config = move.pos_order_ids[:1].config_id if has_pos else None
+            sucursal, punto = config._clocky_branch_codes() if config else default_branch
+            day = move.invoice_date or fields.Date.context_today(move)
+            return move.company_id, sucursal, punto, move._clocky_fe_doc_type(), day
+
+        numbering._assign(self, key_of)
+
+    def _clocky_set_fe_state(self, state):
+        """Change the FE state, writing (and tracking) only the moves where it differs."""
+        moves = self.filtered(lambda m: m.clocky_fe_state != state)
+        if moves:
+            moves.sudo().write({"clocky_fe_state": state})
+
+    # ---------- Payload builder ----------
+
+    @api.model
+    @tools.ormcache("model_name", "concept")
+    def _clocky_resolve_fields(self, model_name, concept):
+        """Return the candidate fields of `concept` that exist on `model_name`.
 
-    def _get_any(self, rec, names):
-        """Return the first valid attribute of `rec` found in `names`.
-        If attribute is a many2one record, return its `.name`; otherwise, return the raw value.
+        Field names only change when modules are (un)installed, i.e. when the
+        registry is reloaded, which also clears this (LRU) cache.
         """
-        for n in names:
-            if hasattr(rec, n):
-                val = getattr(rec, n)
-                if not val:
-                    continue
-                try:
-                    # If it's a record (many2one), prefer its display name
-                    if hasattr(val, "name"):
-                        return val.name or ""
-                except Exception:
-                    pass
-                return val
+        model_fields = self.env[model_name]._fields
+        return tuple(n for n in CLOCKY_FIELD_CANDIDATES[concept] if n in model_fields)
+
+    @api.model
+    def _clocky_get_any(self, rec, concept):
+        """Return the first non-empty value of `rec` among the fields resolved for `concept`.
+        If the field is a many2one, return the record's `.name`; otherwise, return the raw value.
+        """
+        for n in self._clocky_resolve_fields(rec._name, concept):
+            val = rec[n]
+            if not val:
+                continue
+            if rec._fields[n].type == "many2one":
+                return val.name or ""
+            return val
         return ""
 
-    def _cr_address_dict(self, partner):
+    @api.model
+    def _clocky_cr_address_dict(self, partner, cache=None):
         """Build the Costa Rica address block (province, canton, district, neighborhood),
         being tolerant to common field-name variations in the DB.
+        With `cache` (a dict), each partner's block is computed only once per batch.
         """
+        if cache is not None and partner.id in cache:
+            return cache[partner.id]
+
         # Country defaults to CR when missing
         country = (partner.country_id.code or partner.country_id.name or "CR") if partner.country_id else "CR"
 
-        # Typical field name variants seen in CR localizations/customizations:
-        # - province:     state_id / l10n_cr_province_id / province_id / x_province*
-        # - canton:       county_id / l10n_cr_canton_id / canton_id / x_canton*
-        # - district:     district_id / l10n_cr_district_id / x_district*
-        # - neighborhood: neighborhood_id / l10n_cr_neighborhood_id / x_neighborhood* / barrio
-        province = self._get_any(partner, [
-            "l10n_cr_province_id", "province_id", "state_id", "l10n_cr_province",
-            "x_province_id", "x_province"
-        ])
-        canton = self._get_any(partner, [
-            "county_id", "l10n_cr_canton_id", "canton_id", "l10n_cr_canton",
-            "x_canton_id", "x_canton"
-        ])
-        district = self._get_any(partner, [
-            "district_id", "l10n_cr_district_id", "l10n_cr_district",
-            "x_district_id", "x_district"
-        ])
-        neighborhood = self._get_any(partner, [
-            "neighborhood_id", "l10n_cr_neighborhood_id", "l10n_cr_neighborhood",
-            "x_neighborhood_id", "x_neighborhood", "barrio"
-        ])
+        # Field name variants are listed in CLOCKY_FIELD_CANDIDATES
+        province = self._clocky_get_any(partner, "province")
+        canton = self._clocky_get_any(partner, "canton")
+        district = self._clocky_get_any(partner, "district")
+        neighborhood = self._clocky_get_any(partner, "neighborhood")
 
         # Free-form address parts (kept as-is)
         street = partner.street or ""
@@ -178,7 +459,7 @@ class AccountInvoicePreviewWizard(models.TransientModel):
 
         other = " ".join(filter(None, [street, street2, city, zip_code])).strip()
 
-        return {
+        address = {
             "country": country or "CR",
             "province": province or None,
             "canton": canton or None,
@@ -186,9 +467,14 @@ class AccountInvoicePreviewWizard(models.TransientModel):
             "neighborhood": neighborhood or None,  # (barrio)
             "other": other,
         }
+        if cache is not None:
+            cache[partner.id] = address
+        return address
 
-    def _payment_info(self, move):
+    def _clocky_payment_info(self):
         """Return payment condition, inferred term days, and methods (robust to field-name differences)."""
+        self.ensure_one()
+        move = self
         cond = move.invoice_payment_term_id.name if move.invoice_payment_term_id else None
 
         term_days = None
@@ -208,46 +494,108 @@ class AccountInvoicePreviewWizard(models.TransientModel):
 
         # Fallback to payment term lines (days/nb_days/delay)
         if term_days is None and move.invoice_payment_term_id and move.invoice_payment_term_id.line_ids:
+            day_fields = self._clocky_resolve_fields("account.payment.term.line", "term_days")
             line_days = []
             for line in move.invoice_payment_term_id.line_ids:
-                for fname in ("days", "nb_days", "delay"):
-                    if hasattr(line, fname):
-                        val = getattr(line, fname)
-                        if isinstance(val, (int, float)):
-                            line_days.append(int(val))
-                            break
+                for fname in day_fields:
+                    val = line[fname]
+                    if isinstance(val, (int, float)):
+                        line_days.append(int(val))
+                        break
             term_days = max(line_days) if line_days else None
 
         # Payment method (if present)
         methods = []
-        if hasattr(move, "payment_method_line_id") and move.payment_method_line_id:
+        if "payment_method_line_id" in move._fields and move.payment_method_line_id:
             methods = [move.payment_method_line_id.name]
 
         return {"condition": cond, "term_days": term_days, "methods": methods}
 
-    def _uom_info(self, line):
-        """Return UoM name and code, trying common CR localization fields when present."""
+    @api.model
+    def _clocky_uom_info(self, line, cache=None):
+        """Return UoM name and code, trying common CR localization fields when present.
+        With `cache` (a dict), each UoM is resolved only once per batch.
+        """
         uom = line.product_uom_id
+        if cache is not None and uom.id in cache:
+            return cache[uom.id]
         name = uom.name if uom else None
-        code = None
-        for fname in ["l10n_cr_unit_code", "code", "uom_code", "x_uom_code"]:
-            if uom and hasattr(uom, fname):
-                val = getattr(uom, fname)
-                if val:
-                    code = val
-                    break
-        return {"uom_name": name, "uom_code": code}
-
-    def _build_post_payload(self, move):
-        """Build the JSON payload with header, Costa Rica address block, payment terms,
-        and lines including CABYS, taxes, and UoM.
+        code = (self._clocky_get_any(uom, "uom_code") or None) if uom else None
+        info = {"uom_name": name, "uom_code": code}
+        if cache is not None:
+            cache[uom.id] = info
+        return info
+
+    def _clocky_prefetch_payload_data(self):
+        """Load every record the payload builder touches, for all moves at once.
+
+        Each `mapped()` below runs on the whole batch, so the ORM fetches a
+        field for every record of the batch in one query (per model and per
+        chunk of ids) instead of one query per invoice or per line.
+        """
+        lines = self.invoice_line_ids
+        self.mapped("journal_id.code")
+        self.mapped("currency_id.name")
+        self.mapped("invoice_payment_term_id.line_ids")
+        partners = self.partner_id | self.company_id.partner_id
+        partners.mapped("country_id.code")
+        partners.mapped("display_name")
+        lines.mapped("product_id.product_tmpl_id")
+        lines.product_id.mapped("display_name")
+        lines.mapped("tax_ids.name")
+        lines.mapped("product_uom_id.name")
+        lines.mapped("cabys")
+        return lines
+
+    def _clocky_build_payloads(self):
+        """Build the JSON payload of every move in `self`.
+
+        Returns a dict ``{move.id: payload}`` with header, Costa Rica address
+        block, payment terms, and lines including CABYS, taxes, and UoM.
         """
+        with metrics.timed("invoice.payload_build"):
+            self._clocky_prefetch_payload_data()
+            # Address / UoM blocks shared by the whole batch (the company's is
+            # the same for every invoice)
+            cache = {"address": {}, "uom": {}}
+            return {move.id: move._clocky_build_payload(cache) for move in self}
+
+    @api.model
+    def _clocky_payload_digits(self):
+        """Decimal precisions of the non-monetary floats of the payload."""
+        precision = self.env["decimal.precision"]
+        return {
+            "quantity": precision.precision_get("Product Unit of Measure"),
+            "price": precision.precision_get("Product Price"),
+            "discount": precision.precision_get("Discount"),
+        }
+
+    def _clocky_build_payload(self, cache=None):
         self.ensure_one()
+        cache = cache if cache is not None else {"address": {}, "uom": {}}
+        move = self
         currency = move.currency_id
+        digits = cache.get("digits")
+        if digits is None:
+            digits = cache["digits"] = self._clocky_payload_digits()
+
+        # Floats rounded to their precision (currency decimals for amounts), so
+        # the JSON carries no binary noise such as 1234.5600000000002
+        def amount(value):
+            value = float(value or 0.0)
+            return currency.round(value) if currency else value
+
+        def rounded(value, precision):
+            return float_round(float(value or 0.0), precision_digits=precision)
         company_partner = move.company_id.partner_id
         customer = move.partner_id
 
-        payload = {
+        payload = {}
+        if move.clocky_fe_consecutivo:
+            # Hacienda numbers allocated in Odoo (see clocky.fe.numbering)
+            payload["consecutivo"] = move.clocky_fe_consecutivo
+            payload["clave"] = move.clocky_fe_clave
+        payload.update({
             "invoice": {
                 "id": move.id,
                 "move_type": move.move_type,  # e.g., out_invoice
@@ -274,7 +622,7 @@ class AccountInvoicePreviewWizard(models.TransientModel):
                     "vat": company_partner.vat or "",
                     "email": company_partner.email or None,
                     "phone": company_partner.phone or company_partner.mobile or None,
-                    "address": self._cr_address_dict(company_partner),
+                    "address": self._clocky_cr_address_dict(company_partner, cache["address"]),
                 },
                 "partner": {
                     "id": customer.id,
@@ -282,21 +630,21 @@ class AccountInvoicePreviewWizard(models.TransientModel):
                     "vat": customer.vat or "",
                     "email": customer.email or None,
                     "phone": customer.phone or customer.mobile or None,
-                    "address": self._cr_address_dict(customer),
+                    "address": self._clocky_cr_address_dict(customer, cache["address"]),
                 },
                 "amounts": {
-                    "untaxed": float(move.amount_untaxed or 0.0),
-                    "tax": float(move.amount_tax or 0.0),
-                    "total": float(move.amount_total or 0.0),
+                    "untaxed": amount(move.amount_untaxed),
+                    "tax": amount(move.amount_tax),
+                    "total": amount(move.amount_total),
                 },
-                "payment": self._payment_info(move),
+                "payment": move._clocky_payment_info(),
                 "lines": [],
                 "meta": {"source": "odoo", "version": "1.0"},
             }
-        }
+        })
 
         for line in move.invoice_line_ids:
-            uom = self._uom_info(line)
+            uom = self._clocky_uom_info(line, cache["uom"])
             taxes_display = [t.name for t in line.tax_ids] if line.tax_ids else []
             taxes_ids = [t.id for t in line.tax_ids] if line.tax_ids else []
 
@@ -308,217 +656,16 @@ class AccountInvoicePreviewWizard(models.TransientModel):
                     "default_code": line.product_id.default_code or None,
                 },
                 "description": line.name or "",
-                "quantity": float(line.quantity or 0.0),
+                "quantity": rounded(line.quantity, digits["quantity"]),
                 "uom_name": uom["uom_name"],
                 "uom_code": uom["uom_code"],
-                "price_unit": float(line.price_unit or 0.0),
-                "discount": float(line.discount or 0.0),
-                "cabys": getattr(line, "cabys", None) or None,
+                "price_unit": rounded(line.price_unit, digits["price"]),
+                "discount": rounded(line.discount, digits["discount"]),
+                "cabys": line.cabys or None,
                 "taxes_display": taxes_display,
                 "taxes_ids": taxes_ids,
-                "subtotal": float(line.price_subtotal or 0.0),
-                "total": float(line.price_total or 0.0),
+                "subtotal": amount(line.price_subtotal),
+                "total": amount(line.price_total),
             })
 
         return payload
-
-    def _http_post(self, url, payload, headers=None, timeout=25):
-        """Send a JSON POST using urllib (no external dependencies)."""
-        headers = headers or {}
-        headers.setdefault("Content-Type", "application/json")
-        data = json.dumps(payload).encode("utf-8")
-
-        # Respect system root certificates
-        context = ssl.create_default_context()
-        req = Request(url, data=data, headers=headers, method="POST")
-
-        with urlopen(req, context=context, timeout=timeout) as resp:
-            status = resp.getcode()
-            body = resp.read().decode("utf-8", errors="replace")
-        return status, body
-
-    def action_post_invoice(self):
-        """
-        Send a POST with invoice data and then post the invoice.
-        Reads system parameters when available and can block posting if the POST fails.
-        """
-        self.ensure_one()
-        move = self.move_id
-        if move.state != "draft":
-            # 1) Parameters
-            icp = self.env["ir.config_parameter"].sudo()
-            # Uses system parameter; falls back to a test webhook when not set.
-
-            # NOTE: Replace webhook.site URL with a private endpoint for production use.
-            url = (icp.get_param("clocky.facturar_post_url") or "").strip()
-            if not url:
-                url = "https://webhook.site/c7f3f0a4-f206-47b9-9595-b7cfc58828f4"  # TEST fallback
-
-            token = (icp.get_param("clocky.facturar_post_token") or "").strip()
-            block_on_fail = (icp.get_param("clocky.facturar_block_on_fail") or "").strip() in ("1", "true", "True", "TRUE")
-
-            # 2) Build & send POST (if URL present)
-            post_status = None
-            post_body = None
-            post_error = None
-            if url:
-                try:
-                    try:
-                        payload = self._build_post_payload(move)
-                    except Exception:
-                        tb = traceback.format_exc()
-                        # UI message kept in Spanish
-                        raise UserError(_("Fallo construyendo el payload de la factura:\n%s") % tb)
-
-                    headers = {}
-                    if token:
-                        headers["Authorization"] = f"Bearer {token}"
-
-                    post_status, post_body = self._http_post(url, payload, headers=headers)
-
-                    # Log into invoice chatter (UI string kept in Spanish)
-                    move.message_post(
-                        body=_("POST enviado a <b>%s</b> (status <code>%s</code>)<br/><pre style='white-space:pre-wrap;'>%s</pre>") %
-                            (url, post_status, (post_body[:2000] if post_body else "")),
-                        subtype_xmlid="mail.mt_note",
-                    )
-                except (HTTPError, URLError, Exception) as e:
-                    post_error = str(e)
-                    # UI string kept in Spanish
-                    move.message_post(
-                        body=_("Error al enviar POST a <b>%s</b>:<br/><pre style='white-space:pre-wrap;'>%s</pre>") %
-                            (url, post_error[:2000]),
-                        subtype_xmlid="mail.mt_note",
-                    )
-                    if block_on_fail:
-                        # UI message kept in Spanish
-                        raise UserError(_("No fue posible notificar vía POST. Se ha bloqueado la contabilización.\n\nDetalle: %s") % post_error)
-
-
-            # 4) Re-open the now-posted invoice in form view
-            action = self.env["ir.actions.actions"]._for_xml_id("account.action_move_out_invoice_type")
-            action.update({
-                "view_mode": "form",
-                "res_id": move.id,
-                "target": "current",
-            })
-        else:
-            # UI message kept in Spanish
-            raise UserError(_("La factura no puede estar en borrador'."))
-        return action
-    
-
-class AccountMove(models.Model):
-    _inherit = "account.move"
-
-    def action_open_facturar_wizard(self):
-        """
-        Enviar esta factura a la API de facturación (misma lógica de Facturar),
-        pensado para ser llamado automáticamente desde el POS.
-
-        MODO DEBUG:
-        - Además de enviar el POST, lanza un UserError con el status y la respuesta
-          (o el error), para ver en una ventana qué está pasando.
-        """
-        for move in self:
-            # Solo facturas de cliente
-            if move.move_type != "out_invoice":
-                continue
-
-            icp = self.env["ir.config_parameter"].sudo()
-
-            url = (icp.get_param("clocky.facturar_post_url") or "").strip()
-            if not url:
-                move.message_post(
-                    body=_(
-                        "Clocky FE POS: no se ha configurado 'clocky.facturar_post_url', "
-                        "se omite el envío."
-                    ),
-                    subtype_xmlid="mail.mt_note",
-                )
-                # ventana de aviso si ni siquiera hay URL
-                raise UserError(
-                    _(
-                        "Clocky FE POS\n\n"
-                        "No se ha configurado el parámetro del sistema "
-                        "<b>clocky.facturar_post_url</b>.\n\n"
-                        "Sin URL no se puede enviar nada al GAS."
-                    )
-                )
-
-            token = (icp.get_param("clocky.facturar_post_token") or "").strip()
-            block_on_fail_param = (
-                icp.get_param("clocky.facturar_block_on_fail") or ""
-            ).strip().lower()
-            block_on_fail = block_on_fail_param in ("1", "true", "sí", "si", "yes")
-
-            # Creamos un "wizard temporal" solo para reutilizar _build_post_payload y _http_post
-            wizard = self.env["account.invoice.preview.wizard"].new({"move_id": move.id})
-
-            # 1) Construir payload
-            payload = wizard._build_post_payload(move)
-
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            }
-            if token:
-                headers["Authorization"] = f"Bearer {token}"
-
-            post_status = None
-            post_body = ""
-            post_error = ""
-
-            try:
-                # 2) Enviar POST al GAS
-                post_status, post_body = wizard._http_post(url, payload, headers=headers)
-
-                # 3) Registrar en el chatter (como antes)
-                move.message_post(
-                    body=_(
-                        "Clocky FE POS: POST enviado a <b>%s</b> (status <code>%s</code>)"
-                        "<br/><pre style='white-space:pre-wrap;'>%s</pre>"
-                    )
-                    % (url, post_status, (post_body[:2000] if post_body else "")),
-                    subtype_xmlid="mail.mt_note",
-                )
-
-                # 4) *** DEBUG *** mostrar ventana con la respuesta
-                raise UserError(
-                    _(
-                        "Clocky FE POS - Respuesta del servidor\n\n"
-                        "URL: %s\n"
-                        "Status: %s\n\n"
-                        "Body (primeros caracteres):\n%s"
-                    )
-                    % (
-                        url,
-                        post_status,
-                        (post_body[:1000] if post_body else "«vacío»"),
-                    )
-                )
-
-            except Exception as e:
-                post_error = str(e)
-
-                move.message_post(
-                    body=_(
-                        "Clocky FE POS: error al enviar POST a <b>%s</b>:"
-                        "<br/><pre style='white-space:pre-wrap;'>%s</pre>"
-                    )
-                    % (url, post_error[:2000]),
-                    subtype_xmlid="mail.mt_note",
-                )
-
-                # 5) *** DEBUG *** siempre mostramos el error en una ventana
-                raise UserError(
-                    _(
-                        "Clocky FE POS - ERROR al enviar la factura\n\n"
-                        "URL: %s\n\n"
-                        "Detalle:\n%s"
-                    )
-                    % (url, post_error)
-                )
-
-        # En modo debug normalmente no llega aquí porque siempre levantamos UserError
-        return True
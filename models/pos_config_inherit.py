@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+from .clocky_fe_numbering import pad_digits
+
+# Campos Studio con los códigos de Hacienda del punto de venta
+CLOCKY_SUCURSAL_FIELD = "x_studio_codigo_de_sucursal_1"
+CLOCKY_PUNTO_FIELD = "x_studio_codigo_de_punto_de_venta"
+
+
+class PosConfig(models.Model):
+    _inherit = "pos.config"
+
+    # Nivel de log en la consola del navegador para el JS de Clocky
+    # (ver static/src/js/clocky_pos_logger.js)
+    clocky_log_level = fields.Selection(
+        [
+            ("error", "Solo errores"),
+            ("warn", "Advertencias"),
+            ("info", "Información"),
+            ("debug", "Depuración (detallado)"),
+        ],
+        string="Nivel de log Clocky", default="warn", required=True,
+        help="Mensajes del POS Clocky en la consola del navegador. "
+             "Los niveles detallados retienen objetos en memoria; usar solo para diagnóstico.",
+    )
+
+    # Momento del envío FE de los tiquetes (ventas no facturadas); las
+    # facturas del POS siempre se envían por la cola de facturas
+    clocky_fe_send_mode = fields.Selection(
+        [
+            ("immediate", "Al validar cada venta"),
+            ("periodic", "Por lotes durante la sesión"),
+            ("session_close", "Por lotes al cerrar la sesión"),
+        ],
+        string="Envío FE de tiquetes", default="immediate", required=True,
+        help="Por lotes: las ventas quedan pendientes y un cron las envía en lotes grandes "
+             "(cada pocos minutos, o solo cuando la sesión está cerrada), con un resumen "
+             "en la sesión.",
+    )
+
+    def _clocky_branch_codes(self):
+        """Retorna ``(sucursal, punto)`` de Hacienda: 3 y 5 dígitos ("004", "00001").
+
+        Se leen de los campos Studio del POS (si no existen, quedan en ceros).
+        """
+        self.ensure_one()
+
+        def digits(fname, width):
+            return pad_digits(self[fname] if fname in self._fields else "", width)
+
+        return digits(CLOCKY_SUCURSAL_FIELD, 3), digits(CLOCKY_PUNTO_FIELD, 5)
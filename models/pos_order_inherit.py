@@ -1,10 +1,49 @@
 # -*- coding: utf-8 -*-
-from odoo import models
+from odoo import api, fields, models
+from odoo.tools import float_round
+from odoo.tools.sql import create_index
+
+from ..tools import metrics
+from .clocky_fe_numbering import DOC_TYPE_TICKET
 
 
 class PosOrder(models.Model):
     _inherit = "pos.order"
 
+    # Último envío aceptado por el GAS (para no reenviar la misma venta)
+    clocky_fe_sent_hash = fields.Char(string="Hash FE enviado", readonly=True, copy=False)
+    clocky_fe_last_response = fields.Text(string="Última respuesta FE", readonly=True, copy=False)
+    # Números de Hacienda asignados en Odoo (ver clocky.fe.numbering)
+    clocky_fe_consecutivo = fields.Char(string="Consecutivo FE", size=20, readonly=True, copy=False, index=True)
+    clocky_fe_clave = fields.Char(string="Clave FE", size=50, readonly=True, copy=False, index=True)
+    # Tiquete pendiente del envío por lotes (pos.config.clocky_fe_send_mode)
+    clocky_fe_pending = fields.Boolean(string="Envío FE pendiente", readonly=True, copy=False)
+    # Reintentos del envío por lotes (como clocky.fe.outbox: backoff y tope
+    # clocky.outbox_max_attempts; al agotarlos la venta deja de estar pendiente)
+    clocky_fe_attempts = fields.Integer(string="Intentos FE", readonly=True, copy=False)
+    clocky_fe_next_attempt = fields.Datetime(string="Próximo intento FE", readonly=True, copy=False)
+    clocky_fe_failed = fields.Boolean(string="Envío FE fallido", readonly=True, copy=False)
+
+    def init(self):
+        # Solo las ventas pendientes (pocas) entran en el índice
+        create_index(
+            self._cr, "pos_order_clocky_fe_pending_index", self._table,
+            ["id"], where="clocky_fe_pending",
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # En modo por lotes la venta queda pendiente; el cron de la sesión la envía
+        session_ids = {vals.get("session_id") for vals in vals_list if vals.get("session_id")}
+        deferred = set(
+            self.env["pos.session"].browse(session_ids)
+            .filtered(lambda s: s.config_id.clocky_fe_send_mode != "immediate").ids
+        )
+        for vals in vals_list:
+            if vals.get("session_id") in deferred:
+                vals.setdefault("clocky_fe_pending", True)
+        return super().create(vals_list)
+
     def _create_invoice(self, move_vals):
         """
         Extiende la creación de factura del POS para enviar la factura
@@ -19,9 +58,208 @@ class PosOrder(models.Model):
         res = super()._create_invoice(move_vals)
 
         # 2) Por cada pedido de POS, tomar su factura y enviarla a GAS
+        #    (la factura reemplaza al tiquete pendiente del envío por lotes)
+        self.filtered("clocky_fe_pending").write({"clocky_fe_pending": False})
         for order in self:
             move = order.account_move
             if move and move.move_type == "out_invoice" and move.state == "posted":
                 move.clocky_send_fe_from_pos()
 
         return res
+
+    # ---------- Payload FE (constructor del lado del servidor) ----------
+
+    def _clocky_invalid_cabys(self):
+        """Retornar {order_id: [códigos]} de las líneas cuyo CABYS no está en el catálogo.
+
+        Vacío mientras no se haya importado `clocky.cabys.catalog` (igual que
+        `account.move._clocky_invalid_cabys`).
+        """
+        catalog = self.env["clocky.cabys.catalog"]
+        if not catalog._clocky_valid_codes():
+            return {}
+        lines = self.lines
+        by_product = self.env["account.move.line"]._clocky_cabys_by_product(lines.product_id)
+        codes = {}
+        for line in lines:
+            code = by_product.get(line.product_id.id)
+            if code:
+                codes.setdefault(line.order_id.id, set()).add(code)
+        invalid = {}
+        for order_id, order_codes in codes.items():
+            bad = catalog._clocky_invalid_codes(order_codes)
+            if bad:
+                invalid[order_id] = bad
+        return invalid
+
+    def _clocky_assign_fe_numbers(self):
+        """Asignar consecutivo / clave de tiquete (tipo 04) a las ventas que no los tienen.
+
+        Usa la sucursal / punto del POS de cada venta (ver `clocky.fe.numbering`).
+        """
+        branches = {}
+
+        def key_of(order):
+            config = order.config_id
+            if config.id not in branches:
+                branches[config.id] = config._clocky_branch_codes()
+            sucursal, punto = branches[config.id]
+            day = fields.Date.context_today(order, order.date_order)
+            return order.company_id, sucursal, punto, DOC_TYPE_TICKET, day
+
+        self.env["clocky.fe.numbering"]._assign(self, key_of)
+
+    def _clocky_prefetch_payload_data(self):
+        """Cargar en lote todo lo que lee el constructor del payload.
+
+        Cada `mapped()` corre sobre todas las ventas a la vez: el ORM lee cada
+        campo con una consulta por modelo (y por bloque de ids), no una por
+        venta o por línea.
+        """
+        lines = self.lines
+        self.mapped("config_id.journal_id.code")
+        self.mapped("currency_id.name")
+        partners = self.partner_id | self.company_id.partner_id
+        partners.mapped("country_id.code")
+        partners.mapped("display_name")
+        self.payment_ids.mapped("payment_method_id.name")
+        lines.product_id.mapped("display_name")
+        lines.mapped("tax_ids_after_fiscal_position.name")
+        lines.mapped("product_uom_id.name")
+        return lines
+
+    def _clocky_build_payloads(self):
+        """Construir el payload FE de cada venta de `self` (ya sincronizada).
+
+        Misma forma que el payload de facturas (`account.move._clocky_build_payloads`:
+        ``partner``, bloque de dirección CR, impuestos por línea) más los datos
+        de Hacienda del POS (``orden``, ``sucursal``, ``punto``).
+        Retorna ``{order.id: payload}``.
+        """
+        with metrics.timed("pos.payload_build"):
+            lines = self._clocky_prefetch_payload_data()
+            AccountMove = self.env["account.move"]
+            cache = {
+                "address": {},
+                "uom": {},
+                "tax_code": {},
+                "branch": {},
+                "digits": AccountMove._clocky_payload_digits(),
+                "cabys": self.env["account.move.line"]._clocky_cabys_by_product(lines.product_id),
+            }
+            return {order.id: order._clocky_build_payload(cache) for order in self}
+
+    def _clocky_build_payload(self, cache):
+        self.ensure_one()
+        order = self
+        AccountMove = self.env["account.move"]
+        currency = order.currency_id
+        digits = cache["digits"]
+        config = order.config_id
+        if config.id not in cache["branch"]:
+            cache["branch"][config.id] = config._clocky_branch_codes()
+        sucursal, punto = cache["branch"][config.id]
+
+        def amount(value):
+            value = float(value or 0.0)
+            return currency.round(value) if currency else value
+
+        def rounded(value, precision):
+            return float_round(float(value or 0.0), precision_digits=precision)
+
+        def tax_code(tax):
+            if tax.id not in cache["tax_code"]:
+                cache["tax_code"][tax.id] = AccountMove._clocky_get_any(tax, "tax_code") or None
+            return cache["tax_code"][tax.id]
+
+        company_partner = order.company_id.partner_id
+        customer = order.partner_id
+        journal = config.journal_id
+        reference = order.pos_reference or order.name
+
+        payload = {
+            "orden": reference,
+            "sucursal": sucursal,
+            "punto": punto,
+        }
+        if order.clocky_fe_consecutivo:
+            payload["consecutivo"] = order.clocky_fe_consecutivo
+            payload["clave"] = order.clocky_fe_clave
+        payload.update({
+            "invoice": {
+                "id": order.id,
+                "move_type": "out_invoice",
+                "name": reference,
+                "state": "posted",
+                "journal": {
+                    "id": journal.id,
+                    "name": journal.display_name or config.name or "POS",
+                    "code": journal.code or None,
+                },
+                "currency": {
+                    "id": currency.id if currency else 0,
+                    "name": currency.name if currency else "",
+                    "symbol": currency.symbol if currency else "",
+                    "position": currency.position if currency else "before",
+                },
+                "dates": {
+                    "invoice_date": str(fields.Date.context_today(order, order.date_order)),
+                    "invoice_date_due": None,
+                },
+                "company": {
+                    "id": order.company_id.id,
+                    "name": order.company_id.name or (company_partner.display_name or ""),
+                    "vat": company_partner.vat or "",
+                    "email": company_partner.email or None,
+                    "phone": company_partner.phone or company_partner.mobile or None,
+                    "address": AccountMove._clocky_cr_address_dict(company_partner, cache["address"]),
+                },
+                "partner": {
+                    "id": customer.id or 0,
+                    "name": customer.display_name or "Cliente mostrador",
+                    "vat": customer.vat or "",
+                    "email": customer.email or None,
+                    "phone": customer.phone or customer.mobile or None,
+                    "address": AccountMove._clocky_cr_address_dict(customer, cache["address"]),
+                },
+                "amounts": {
+                    "untaxed": amount(order.amount_total - order.amount_tax),
+                    "tax": amount(order.amount_tax),
+                    "total": amount(order.amount_total),
+                },
+                "payment": {
+                    "condition": "POS",
+                    "term_days": 0,
+                    "methods": [p.payment_method_id.name for p in order.payment_ids if p.payment_method_id],
+                },
+                "lines": [],
+                "meta": {"source": "odoo_pos", "version": "1.0"},
+            },
+        })
+
+        for line in order.lines:
+            product = line.product_id
+            taxes = line.tax_ids_after_fiscal_position
+            uom = AccountMove._clocky_uom_info(line, cache["uom"])
+            payload["invoice"]["lines"].append({
+                "id": line.id,
+                "product": {
+                    "id": product.id or 0,
+                    "name": product.display_name or (line.full_product_name or ""),
+                    "default_code": product.default_code or None,
+                },
+                "description": line.full_product_name or product.display_name or "",
+                "quantity": rounded(line.qty, digits["quantity"]),
+                "uom_name": uom["uom_name"],
+                "uom_code": uom["uom_code"],
+                "price_unit": rounded(line.price_unit, digits["price"]),
+                "discount": rounded(line.discount, digits["discount"]),
+                "cabys": cache["cabys"].get(product.id) or None,
+                "taxes_display": [t.name for t in taxes],
+                "taxes_ids": taxes.ids,
+                "tax_codes": [code for code in map(tax_code, taxes) if code],
+                "subtotal": amount(line.price_subtotal),
+                "total": amount(line.price_subtotal_incl),
+            })
+
+        return payload
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import threading
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+
+from ..tools import transport
+
+# Ventas por construcción de payloads / commit en el envío por lotes
+FLUSH_CHUNK_SIZE = 200
+
+
+class PosSession(models.Model):
+    _inherit = "pos.session"
+
+    def _validate_session(self, *args, **kwargs):
+        """Al cerrar la sesión, lanzar el envío por lotes de sus tiquetes pendientes."""
+        res = super()._validate_session(*args, **kwargs)
+        if any(config.clocky_fe_send_mode != "immediate" for config in self.config_id):
+            cron = self.env.ref(
+                "clocky_accounting_integration.ir_cron_clocky_pos_flush", raise_if_not_found=False,
+            )
+            if cron:
+                cron.sudo()._trigger()
+        return res
+
+    @api.model
+    def _cron_clocky_flush_orders(self, limit=None):
+        """Enviar por lotes los tiquetes pendientes (`pos.order.clocky_fe_pending`).
+
+        Modo "periodic": se envían durante la sesión; modo "session_close":
+        solo cuando la sesión ya está cerrada. Los tiquetes se toman en bloques
+        con ``FOR UPDATE SKIP LOCKED`` (dos crons nunca envían la misma venta),
+        cada bloque se construye y envía en lote (`_clocky_send_order_records`)
+        y se confirma en la base de datos. Los fallidos se reintentan con el
+        backoff de `clocky.fe.outbox` hasta `clocky.outbox_max_attempts`
+        intentos; después dejan de estar pendientes y quedan marcados
+        `clocky_fe_failed` (``abandoned`` en el resumen). Cada sesión recibe
+        un resumen en su historial.
+        Retorna ``{session_id: {"sent": n, "failed": n, "abandoned": n}}``.
+        """
+        settings = self.env["clocky.settings"]._get_all()
+        limit = limit or settings["pos_flush_limit"]
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        integration = self.env["clocky.pos.integration"]
+        Order = self.env["pos.order"].sudo()
+        summary = {}
+        processed = last_id = 0
+        while processed < limit:
+            self.env.cr.execute(
+                """
+                SELECT o.id FROM pos_order o
+                  JOIN pos_session s ON s.id = o.session_id
+                  JOIN pos_config c ON c.id = s.config_id
+                 WHERE o.clocky_fe_pending
+                   AND (o.clocky_fe_next_attempt IS NULL
+                        OR o.clocky_fe_next_attempt <= (now() at time zone 'utc'))
+                   AND o.account_move IS NULL
+                   AND o.state IN ('paid', 'done')
+                   AND (c.clocky_fe_send_mode = 'periodic' OR s.state = 'closed')
+                   AND o.id > %s
+                 ORDER BY o.id
+                 LIMIT %s
+                   FOR UPDATE OF o SKIP LOCKED
+                """,
+                [last_id, min(FLUSH_CHUNK_SIZE, limit - processed)],
+            )
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            if not ids:
+                break
+            last_id = ids[-1]
+            orders = Order.browse(ids)
+            results = integration._clocky_send_order_records(orders)
+            sent = Order.browse([order.id for order, result in zip(orders, results) if result.get("ok")])
+            sent.write({"clocky_fe_pending": False, "clocky_fe_failed": False})
+            outcomes = self._clocky_reschedule_failed(
+                [(order, result) for order, result in zip(orders, results) if not result.get("ok")],
+                settings,
+            )
+            outcomes.update((order.id, "sent") for order in sent)
+            for order in orders:
+                counts = summary.setdefault(order.session_id.id, {"sent": 0, "failed": 0, "abandoned": 0})
+                counts[outcomes[order.id]] += 1
+            processed += len(ids)
+            if auto_commit:
+                self.env.cr.commit()
+
+        for session in self.sudo().browse(list(summary)):
+            counts = summary[session.id]
+            session.message_post(
+                body=_("Clocky FE: %(sent)s tiquetes enviados al GAS, %(failed)s fallidos "
+                       "(se reintentan más tarde), %(abandoned)s sin más reintentos.") % counts,
+                subtype_xmlid="mail.mt_note",
+            )
+        return summary
+
+    @api.model
+    def _clocky_reschedule_failed(self, failures, settings):
+        """Reprogramar los envíos fallidos (lista de ``(order, result)``) con backoff.
+
+        Igual que `clocky.fe.outbox._mark_failed`: un envío cortado por el
+        circuito abierto no cuenta como intento y espera al fin de su enfriamiento.
+        Una escritura por grupo de ventas con el mismo resultado.
+        Retorna ``{order_id: "failed" | "abandoned"}``.
+        """
+        Outbox = self.env["clocky.fe.outbox"]
+        now = fields.Datetime.now()
+        groups = {}
+        outcomes = {}
+        for order, result in failures:
+            circuit_open = result.get("error_type") == transport.CircuitOpenError.__name__
+            if circuit_open:
+                attempts, abandoned = order.clocky_fe_attempts, False
+            else:
+                attempts = order.clocky_fe_attempts + 1
+                abandoned = attempts >= settings["outbox_max_attempts"]
+            groups.setdefault((attempts, abandoned, circuit_open), []).append(order.id)
+            outcomes[order.id] = "abandoned" if abandoned else "failed"
+        for (attempts, abandoned, circuit_open), order_ids in groups.items():
+            if circuit_open:
+                delay = timedelta(seconds=settings["breaker_cooldown"])
+            else:
+                delay = Outbox._retry_delay(attempts)
+            self.env["pos.order"].sudo().browse(order_ids).write({
+                "clocky_fe_attempts": attempts,
+                "clocky_fe_next_attempt": now + delay,
+                "clocky_fe_pending": not abandoned,
+                "clocky_fe_failed": abandoned,
+            })
+        return outcomes
+
+    def _pos_data_process(self, loaded_data):
+        """
+        Agrega al arranque del POS el código CABYS de los productos cargados
+        (``{product_id: cabys}``), leído una sola vez por sesión y en lote.
+        El resumen del popup lo consulta por id en lugar de buscar campo por
+        campo en cada línea.
+        """
+        super()._pos_data_process(loaded_data)
+        product_ids = [p["id"] for p in loaded_data.get("product.product") or []]
+        loaded_data["clocky_product_meta"] = self._clocky_product_meta(product_ids)
+
+    def clocky_get_product_meta(self, product_ids):
+        """CABYS de productos cargados después del arranque (carga diferida del POS)."""
+        self.ensure_one()
+        return self._clocky_product_meta(product_ids)
+
+    def _clocky_product_meta(self, product_ids):
+        """Retorna ``{product_id: cabys o None}`` (todos los ids pedidos)."""
+        products = self.env["product.product"].browse(product_ids)
+        cabys = self.env["account.move.line"]._clocky_cabys_by_product(products)
+        return {product.id: cabys.get(product.id) or None for product in products}
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from odoo import fields, models
+
+
+class ResConfigSettings(models.TransientModel):
+    _inherit = "res.config.settings"
+
+    # Parámetros del sistema clocky.* (leídos en caché por `clocky.settings`)
+    clocky_facturar_post_url = fields.Char(
+        string="URL del Web App (facturas)", config_parameter="clocky.facturar_post_url",
+    )
+    clocky_facturar_post_token = fields.Char(
+        string="Token (facturas)", config_parameter="clocky.facturar_post_token",
+    )
+    clocky_pos_post_url = fields.Char(
+        string="URL del Web App (POS)", config_parameter="clocky.pos_post_url",
+        help="Vacío: se usa la URL de facturas.",
+    )
+    clocky_pos_post_token = fields.Char(
+        string="Token (POS)", config_parameter="clocky.pos_post_token",
+        help="Vacío: se usa el token de facturas.",
+    )
+    clocky_facturar_block_on_fail = fields.Boolean(
+        string="Bloquear si falla el envío", config_parameter="clocky.facturar_block_on_fail",
+        help="Envía al confirmar desde la vista previa y no contabiliza si el GAS falla.",
+    )
+    clocky_fe_status_url = fields.Char(
+        string="URL de consulta de estado", config_parameter="clocky.fe_status_url",
+        help="Vacío: se consulta la URL de facturas (con \"action\": \"status\").",
+    )
+    clocky_status_batch_size = fields.Integer(
+        string="Documentos por consulta de estado", config_parameter="clocky.status_batch_size", default=100,
+    )
+    clocky_fe_local_numbering = fields.Boolean(
+        string="Consecutivos en Odoo", config_parameter="clocky.fe_local_numbering",
+        help="Odoo asigna el consecutivo y la clave de Hacienda (secuencias PostgreSQL por "
+             "compañía, sucursal, punto y tipo de documento) en lugar del GAS.",
+    )
+    clocky_fe_sucursal = fields.Char(
+        string="Sucursal (facturas)", config_parameter="clocky.fe_sucursal", default="001",
+        help="Sucursal de las facturas que no vienen del POS (3 dígitos).",
+    )
+    clocky_fe_punto = fields.Char(
+        string="Punto de venta (facturas)", config_parameter="clocky.fe_punto", default="00001",
+        help="Punto de venta de las facturas que no vienen del POS (5 dígitos).",
+    )
+    clocky_fe_situacion = fields.Selection(
+        [("1", "Normal"), ("2", "Contingencia"), ("3", "Sin internet")],
+        string="Situación del comprobante", config_parameter="clocky.fe_situacion", default="1",
+    )
+    clocky_facturar_batch_size = fields.Integer(
+        string="Documentos por POST", config_parameter="clocky.facturar_batch_size", default=1,
+    )
+    clocky_outbox_max_attempts = fields.Integer(
+        string="Intentos máximos", config_parameter="clocky.outbox_max_attempts", default=8,
+    )
+    clocky_outbox_batch_limit = fields.Integer(
+        string="Documentos por ejecución del cron", config_parameter="clocky.outbox_batch_limit", default=100,
+    )
+    clocky_resend_concurrency = fields.Integer(
+        string="Envíos en paralelo (reenvío masivo)", config_parameter="clocky.resend_concurrency", default=4,
+    )
+    clocky_http_connect_timeout = fields.Float(
+        string="Timeout de conexión (s)", config_parameter="clocky.http_connect_timeout", default=10.0,
+    )
+    clocky_http_read_timeout = fields.Float(
+        string="Timeout de respuesta (s)", config_parameter="clocky.http_read_timeout",
+        help="Vacío: 25 s para facturas, 30 s para POS.",
+    )
+    clocky_http_gzip = fields.Boolean(
+        string="Comprimir con gzip", config_parameter="clocky.http_gzip",
+    )
+    clocky_http_chunked = fields.Boolean(
+        string="Envío por partes (chunked)", config_parameter="clocky.http_chunked",
+    )
+    # Un campo numérico en 0 se guarda como parámetro vacío (vuelve el valor por
+    # defecto): desactivar el timeout adaptativo y el circuito es un booleano aparte
+    clocky_http_timeout_fixed = fields.Boolean(
+        string="Timeout fijo", config_parameter="clocky.http_timeout_fixed",
+        help="Usar siempre el timeout de respuesta configurado, sin adaptarlo a la latencia.",
+    )
+    clocky_http_timeout_factor = fields.Float(
+        string="Factor de timeout adaptativo", config_parameter="clocky.http_timeout_factor", default=3.0,
+        help="Timeout de respuesta = latencia p99 observada x factor (sin superar el configurado).",
+    )
+    clocky_http_timeout_floor = fields.Float(
+        string="Timeout adaptativo mínimo (s)", config_parameter="clocky.http_timeout_floor", default=5.0,
+    )
+    clocky_breaker_disabled = fields.Boolean(
+        string="Desactivar el circuito", config_parameter="clocky.breaker_disabled",
+        help="Enviar siempre al GAS, aunque haya fallos consecutivos.",
+    )
+    clocky_breaker_failures = fields.Integer(
+        string="Fallos para abrir el circuito", config_parameter="clocky.breaker_failures", default=5,
+        help="Fallos consecutivos tras los cuales se dejan de enviar peticiones al GAS "
+             "durante la pausa.",
+    )
+    clocky_breaker_cooldown = fields.Float(
+        string="Pausa del circuito (s)", config_parameter="clocky.breaker_cooldown", default=30.0,
+        help="Tiempo con el circuito abierto antes de una petición de prueba.",
+    )
+    clocky_pos_flush_limit = fields.Integer(
+        string="Ventas por ejecución del cron (POS)", config_parameter="clocky.pos_flush_limit", default=2000,
+    )
+    clocky_send_log_keep_forever = fields.Boolean(
+        string="Conservar el registro de envíos", config_parameter="clocky.send_log_keep_forever",
+        help="No borrar los registros de envíos por antigüedad.",
+    )
+    clocky_send_log_retention_days = fields.Integer(
+        string="Días de registro de envíos", config_parameter="clocky.send_log_retention_days", default=30,
+    )
+    clocky_preview_page_size = fields.Integer(
+        string="Líneas por página (vista previa)", config_parameter="clocky.preview_page_size", default=100,
+    )
+
+    pos_clocky_log_level = fields.Selection(
+        related="pos_config_id.clocky_log_level", readonly=False,
+    )
+    pos_clocky_fe_send_mode = fields.Selection(
+        related="pos_config_id.clocky_fe_send_mode", readonly=False,
+    )
@@ -0,0 +1,49 @@
+/** @odoo-module **/
+
+// clocky_pos_logger.js
+import { patch } from "@web/core/utils/patch";
+import { PosStore } from "@point_of_sale/app/store/pos_store";
+
+/**
+ * Logger central del POS Clocky.
+ *
+ * El nivel se toma de pos.config (clocky_log_level, por defecto "warn").
+ * Los niveles desactivados son funciones vacías: no formatean nada ni
+ * retienen referencias a los objetos en la consola del navegador.
+ * Para datos caros de armar, usar isLogEnabled("debug") antes de construirlos.
+ */
+
+const LEVELS = { error: 0, warn: 1, info: 2, debug: 3 };
+const DEFAULT_LEVEL = "warn";
+const PREFIX = "[Clocky POS]";
+
+const noop = () => {};
+
+export const logger = {
+    error: noop,
+    warn: noop,
+    info: noop,
+    debug: noop,
+};
+
+let currentLevel = LEVELS[DEFAULT_LEVEL];
+
+export function setLogLevel(level) {
+    currentLevel = level in LEVELS ? LEVELS[level] : LEVELS[DEFAULT_LEVEL];
+    for (const name of Object.keys(LEVELS)) {
+        logger[name] = LEVELS[name] <= currentLevel ? console[name].bind(console, PREFIX) : noop;
+    }
+}
+
+export function isLogEnabled(level) {
+    return LEVELS[level] <= currentLevel;
+}
+
+setLogLevel(DEFAULT_LEVEL);
+
+patch(PosStore.prototype, {
+    async _processData(loadedData) {
+        await super._processData(...arguments);
+        setLogLevel(this.config && this.config.clocky_log_level);
+    },
+});
@@ -0,0 +1,309 @@
+/** @odoo-module **/
+
+// clocky_pos_outbox.js
+import { patch } from "@web/core/utils/patch";
+import { PosStore } from "@point_of_sale/app/store/pos_store";
+
+import { logger } from "@clocky_accounting_integration/js/clocky_pos_logger";
+import {
+    sendPosOrdersToGas,
+    sendPosPayloadsToGas,
+} from "@clocky_accounting_integration/js/clocky_pos_gas_service";
+
+/**
+ * Buffer local (offline) de ventas pendientes de enviar a GAS.
+ *
+ * - Se guarda solo la referencia de cada venta (el payload lo construye el
+ *   servidor desde pos.order) en IndexedDB, así sobrevive a recargas de
+ *   página y a caídas de red (si IndexedDB no está disponible se usa memoria).
+ * - Un "flush" en segundo plano las envía por lotes a
+ *   clocky.pos.integration.clocky_pos_send_orders, con reintentos y backoff
+ *   exponencial por venta (una venta aún no sincronizada se reintenta).
+ * - Las entradas antiguas con el payload completo se siguen enviando con
+ *   clocky_pos_post_to_gas.
+ * - Una venta con un error permanente (sin URL configurada, rechazada por
+ *   el GAS...) o que agota MAX_ATTEMPTS intentos pasa a "dead letter": queda
+ *   en IndexedDB pero ya no se reintenta, y se avisa al cajero. Se puede
+ *   volver a encolar con requeueDeadPosOutboxEntries().
+ * - Nunca bloquea el flujo de cobro: encolar es una escritura local.
+ */
+
+const DB_NAME = "clocky_pos_outbox";
+const STORE_NAME = "payloads";
+const FLUSH_BATCH_SIZE = 20;
+const FLUSH_INTERVAL_MS = 30 * 1000;
+const RETRY_BASE_MS = 5 * 1000;
+const RETRY_MAX_MS = 10 * 60 * 1000;
+// Con el backoff, ~2 horas de reintentos (p. ej. una venta que nunca se sincroniza)
+const MAX_ATTEMPTS = 20;
+// error_type del servidor que no se resuelven reintentando lo mismo
+const PERMANENT_ERRORS = new Set(["MissingUrl", "SerializationError", "RejectedBatchItem", "InvalidCabys"]);
+
+let dbPromise = null;
+const memoryStore = new Map();
+let ormService = null;
+let notificationService = null;
+let flushing = false;
+let flushTimer = null;
+
+function openDb() {
+    if (dbPromise) {
+        return dbPromise;
+    }
+    dbPromise = new Promise((resolve) => {
+        if (!window.indexedDB) {
+            resolve(null);
+            return;
+        }
+        const request = window.indexedDB.open(DB_NAME, 1);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            if (!db.objectStoreNames.contains(STORE_NAME)) {
+                db.createObjectStore(STORE_NAME, { keyPath: "key" });
+            }
+        };
+        request.onsuccess = () => resolve(request.result);
+        // Sin IndexedDB (modo privado, cuota...) seguimos en memoria
+        request.onerror = () => resolve(null);
+    });
+    return dbPromise;
+}
+
+function txRequest(db, mode, callback) {
+    return new Promise((resolve, reject) => {
+        const tx = db.transaction(STORE_NAME, mode);
+        const result = callback(tx.objectStore(STORE_NAME));
+        tx.oncomplete = () => resolve(result && "result" in result ? result.result : undefined);
+        tx.onerror = () => reject(tx.error);
+        tx.onabort = () => reject(tx.error);
+    });
+}
+
+async function putEntries(entries) {
+    const db = await openDb();
+    if (!db) {
+        entries.forEach((entry) => memoryStore.set(entry.key, entry));
+        return;
+    }
+    await txRequest(db, "readwrite", (store) => {
+        entries.forEach((entry) => store.put(entry));
+    });
+}
+
+async function deleteKeys(keys) {
+    const db = await openDb();
+    if (!db) {
+        keys.forEach((key) => memoryStore.delete(key));
+        return;
+    }
+    await txRequest(db, "readwrite", (store) => {
+        keys.forEach((key) => store.delete(key));
+    });
+}
+
+async function getAllEntries() {
+    const db = await openDb();
+    if (!db) {
+        return [...memoryStore.values()];
+    }
+    return (await txRequest(db, "readonly", (store) => store.getAll())) || [];
+}
+
+/**
+ * Envía un lote del buffer y devuelve un resultado por entrada (mismo orden).
+ * Las entradas con referencia van en una sola llamada; las antiguas con
+ * payload completo, en otra.
+ */
+async function sendEntries(batch) {
+    const results = new Array(batch.length).fill(null);
+    const byReference = [];
+    const byPayload = [];
+    batch.forEach((entry, index) => {
+        (entry.reference ? byReference : byPayload).push(index);
+    });
+    if (byReference.length) {
+        const sent = await sendPosOrdersToGas(
+            byReference.map((index) => batch[index].reference),
+            ormService
+        );
+        byReference.forEach((index, i) => (results[index] = sent[i]));
+    }
+    if (byPayload.length) {
+        const sent = await sendPosPayloadsToGas(
+            byPayload.map((index) => batch[index].payload),
+            ormService
+        );
+        byPayload.forEach((index, i) => (results[index] = sent[i]));
+    }
+    return results;
+}
+
+function retryDelay(attempts) {
+    return Math.min(RETRY_BASE_MS * 2 ** Math.max(attempts - 1, 0), RETRY_MAX_MS);
+}
+
+function notifyDeadEntries(entries) {
+    if (!entries.length) {
+        return;
+    }
+    const detail = entries
+        .slice(0, 5)
+        .map((entry) => `${entry.reference || entry.key}: ${entry.lastError}`)
+        .join("\n");
+    const message =
+        `${entries.length} venta(s) no se pudieron enviar a facturación electrónica ` +
+        `y ya no se reintentarán:\n${detail}`;
+    logger.error(message);
+    if (notificationService) {
+        notificationService.add(message, { type: "danger", sticky: true });
+    }
+}
+
+/**
+ * Guarda la referencia de la venta en el buffer local y programa un envío
+ * en segundo plano. No espera a la red: la venta queda a salvo aunque no
+ * haya conexión.
+ */
+export async function enqueuePosOrder(reference, orm) {
+    if (orm) {
+        ormService = orm;
+    }
+    if (!reference) {
+        return;
+    }
+    await putEntries([
+        {
+            key: String(reference),
+            reference: String(reference),
+            attempts: 0,
+            nextAttempt: 0,
+            lastError: null,
+            errorType: null,
+            dead: false,
+            createdAt: Date.now(),
+        },
+    ]);
+    scheduleFlush(0);
+}
+
+/**
+ * Envía por lotes los payloads cuyo próximo intento ya venció.
+ * Los aceptados se eliminan del buffer; los fallidos se reprograman con
+ * backoff, salvo los errores permanentes y los que agotan MAX_ATTEMPTS,
+ * que pasan a "dead letter".
+ */
+export async function flushPosOutbox() {
+    if (flushing || !ormService) {
+        return;
+    }
+    if (window.navigator && window.navigator.onLine === false) {
+        return;
+    }
+    flushing = true;
+    try {
+        const now = Date.now();
+        const due = (await getAllEntries())
+            .filter((entry) => !entry.dead && entry.nextAttempt <= now)
+            .sort((a, b) => a.createdAt - b.createdAt);
+
+        for (let i = 0; i < due.length; i += FLUSH_BATCH_SIZE) {
+            const batch = due.slice(i, i + FLUSH_BATCH_SIZE);
+            let results = null;
+            try {
+                results = await sendEntries(batch);
+            } catch (err) {
+                results = null;
+            }
+
+            const sent = [];
+            const retry = [];
+            const dead = [];
+            batch.forEach((entry, index) => {
+                const result = Array.isArray(results) ? results[index] : null;
+                if (result && result.ok) {
+                    sent.push(entry.key);
+                } else {
+                    const attempts = entry.attempts + 1;
+                    const errorType = (result && result.error_type) || null;
+                    const failed = {
+                        ...entry,
+                        attempts,
+                        nextAttempt: Date.now() + retryDelay(attempts),
+                        lastError: (result && result.error) || "Error de red/RPC",
+                        errorType,
+                        dead: PERMANENT_ERRORS.has(errorType) || attempts >= MAX_ATTEMPTS,
+                    };
+                    retry.push(failed);
+                    if (failed.dead) {
+                        dead.push(failed);
+                    }
+                }
+            });
+            if (sent.length) {
+                await deleteKeys(sent);
+            }
+            if (retry.length) {
+                await putEntries(retry);
+            }
+            notifyDeadEntries(dead);
+            if (!Array.isArray(results)) {
+                // Fallo de red/RPC: no insistimos con el resto hasta el próximo flush
+                break;
+            }
+        }
+    } finally {
+        flushing = false;
+    }
+}
+
+/**
+ * Ventas en "dead letter": quedaron en el buffer pero ya no se reintentan.
+ */
+export async function getDeadPosOutboxEntries() {
+    return (await getAllEntries()).filter((entry) => entry.dead);
+}
+
+/**
+ * Vuelve a encolar las ventas en "dead letter" (p. ej. después de configurar
+ * la URL o corregir el documento), con el contador de intentos en cero.
+ */
+export async function requeueDeadPosOutboxEntries() {
+    const dead = await getDeadPosOutboxEntries();
+    if (dead.length) {
+        await putEntries(
+            dead.map((entry) => ({ ...entry, attempts: 0, nextAttempt: 0, dead: false }))
+        );
+        scheduleFlush(0);
+    }
+    return dead.length;
+}
+
+function scheduleFlush(delay) {
+    if (flushTimer) {
+        clearTimeout(flushTimer);
+    }
+    flushTimer = setTimeout(() => {
+        flushTimer = null;
+        flushPosOutbox().finally(() => scheduleFlush(FLUSH_INTERVAL_MS));
+    }, delay);
+}
+
+/**
+ * Arranca el buffer al cargar el POS: reenvía lo que quedó pendiente de
+ * sesiones/recargas anteriores y vuelve a intentar al recuperar la conexión.
+ */
+export function startPosOutbox(orm, notification) {
+    ormService = orm;
+    notificationService = notification || null;
+    window.addEventListener("online", () => scheduleFlush(0));
+    // Recordar al cajero las ventas que quedaron sin enviar en sesiones anteriores
+    getDeadPosOutboxEntries().then(notifyDeadEntries);
+    scheduleFlush(0);
+}
+
+patch(PosStore.prototype, {
+    async setup() {
+        await super.setup(...arguments);
+        startPosOutbox(this.orm, this.env && this.env.services && this.env.services.notification);
+    },
+});
@@ -4,8 +4,10 @@
 import { patch } from "@web/core/utils/patch";
 import { PaymentScreen } from "@point_of_sale/app/screens/payment_screen/payment_screen";
 
-import { buildPosPayload } from "@clocky_accounting_integration/js/clocky_pos_payload";
-import { sendPosOrderToGas } from "@clocky_accounting_integration/js/clocky_pos_gas_service";
+import { isLogEnabled, logger } from "@clocky_accounting_integration/js/clocky_pos_logger";
+import { buildPosSummary } from "@clocky_accounting_integration/js/clocky_pos_summary";
+import { enqueuePosOrder } from "@clocky_accounting_integration/js/clocky_pos_outbox";
+import { ensureProductMeta } from "@clocky_accounting_integration/js/clocky_pos_product_meta";
 
 // Guardamos referencia al método original ANTES del patch
 const _superValidateOrder = PaymentScreen.prototype.validateOrder;
@@ -13,7 +15,7 @@ const _superValidateOrder = PaymentScreen.prototype.validateOrder;
 function showClockyOrderPopup(paymentScreen) {
     const order = paymentScreen.currentOrder;
     if (!order) {
-        console.warn("[Clocky POS] showClockyOrderPopup(): no hay currentOrder");
+        logger.warn("showClockyOrderPopup(): no hay currentOrder");
         return;
     }
 
@@ -23,15 +25,14 @@ function showClockyOrderPopup(paymentScreen) {
         paymentScreen.env.pos || // fallback por si acaso
         {};
 
-    console.log("[Clocky POS] showClockyOrderPopup() llamado, POS:", pos);
+    logger.debug("showClockyOrderPopup() llamado, POS:", pos);
 
-    const built = buildPosPayload(order, pos);
-    if (!built) {
-        console.error("[Clocky POS] buildPosPayload() devolvió null");
+    const summary = buildPosSummary(order, pos);
+    if (!summary) {
+        logger.error("buildPosSummary() devolvió null");
         return;
     }
 
-    const { payload, ui } = built;
     const {
         orderName,
         clientName,
@@ -44,23 +45,28 @@ function showClockyOrderPopup(paymentScreen) {
         total,
         currencySymbol,
         currencyName,
-    } = ui;
+        lines,
+    } = summary;
 
-    console.log("[Clocky POS] Payload final para Odoo (proxy GAS):", payload);
-    console.log("[Clocky POS] Moneda resuelta:", {
-        currencyName,
-        currencySymbol,
-    });
+    if (isLogEnabled("debug")) {
+        logger.debug("Resumen de la venta:", summary);
+    }
 
-    // Disparar el envío (no bloqueamos la UI)
-    try {
-        void sendPosOrderToGas(payload, paymentScreen);
-    } catch (e) {
-        console.error("[Clocky POS] Error inesperado al invocar sendPosOrderToGas:", e);
+    // Guardar solo la referencia de la venta en el buffer local: el servidor
+    // arma el payload desde pos.order y se envía en segundo plano (por lotes
+    // y con reintentos), sin bloquear la UI ni perderla si no hay red.
+    // En los modos por lotes (clocky_fe_send_mode) la envía el cron del servidor.
+    const sendMode = (pos.config && pos.config.clocky_fe_send_mode) || "immediate";
+    if (sendMode === "immediate") {
+        const orm =
+            paymentScreen.orm ||
+            (paymentScreen.env && paymentScreen.env.services && paymentScreen.env.services.orm);
+        enqueuePosOrder(orderName, orm).catch((e) => {
+            logger.error("Error inesperado al encolar la venta:", e);
+        });
     }
 
-    // Construimos el HTML de las líneas a partir del payload
-    const lines = payload.invoice.lines || [];
+    // Construimos el HTML de las líneas a partir del resumen
     let linesHtml = "";
 
     lines.forEach((l) => {
@@ -68,8 +74,7 @@ function showClockyOrderPopup(paymentScreen) {
         const qty = l.quantity || 0;
         const unitPrice = l.price_unit || 0;
         const discount = l.discount || 0;
-        const taxesDisplay =
-            (Array.isArray(l.taxes_display) && l.taxes_display[0]) || "-";
+        const taxesDisplay = l.taxes_display || "-";
         const cabysCode = l.cabys || "";
         const subtotal = l.subtotal || 0;
         const totalLine = l.total || 0;
@@ -202,20 +207,34 @@ function showClockyOrderPopup(paymentScreen) {
 // ==================== PATCH PaymentScreen ====================
 
 patch(PaymentScreen.prototype, {
+    setup() {
+        super.setup(...arguments);
+        // Precargar en segundo plano el mapa FE de los productos cargados en
+        // diferido (sin await: sin red, el cobro no espera a este RPC)
+        const order = this.currentOrder;
+        if (order && order.get_orderlines) {
+            ensureProductMeta(
+                this.pos,
+                this.orm,
+                order.get_orderlines().map((line) => line.get_product && line.get_product())
+            );
+        }
+    },
+
     async validateOrder(isForceValidate) {
-        console.log("[Clocky POS] validateOrder() (parche Clocky) :: inicio", {
-            isForceValidate,
-        });
+        logger.debug("validateOrder() (parche Clocky) :: inicio", isForceValidate);
 
         // 1) Llamar al flujo normal de Odoo
         const res = await _superValidateOrder.call(this, isForceValidate);
 
-        console.log(
-            "[Clocky POS] validateOrder() :: después de _super, currentOrder:",
+        logger.debug(
+            "validateOrder() :: después de _super, currentOrder:",
             this.currentOrder
         );
 
-        // 2) Mostrar popup con el payload de la orden
+        // 2) Mostrar popup con el resumen de la orden. Sin RPC en este punto:
+        //    el mapa FE se precargó al abrir la pantalla de pago y, si falta,
+        //    el CABYS sale de los campos del producto.
         showClockyOrderPopup(this);
 
         // 3) Devolver el resultado original
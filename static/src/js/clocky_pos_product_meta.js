@@ -0,0 +1,56 @@
+/** @odoo-module **/
+
+// clocky_pos_product_meta.js
+import { patch } from "@web/core/utils/patch";
+import { PosStore } from "@point_of_sale/app/store/pos_store";
+
+import { logger } from "@clocky_accounting_integration/js/clocky_pos_logger";
+
+/**
+ * CABYS de los productos ({product_id: cabys}) que el servidor lee una sola
+ * vez por sesión (pos.session._pos_data_process).
+ * El resumen del popup (buildPosSummary) lo consulta por id, sin búsquedas
+ * ni logs por línea.
+ */
+
+patch(PosStore.prototype, {
+    async _processData(loadedData) {
+        await super._processData(...arguments);
+        this.clockyProductMeta = loadedData["clocky_product_meta"] || {};
+    },
+});
+
+export function getProductCabys(pos, product) {
+    const meta = pos && pos.clockyProductMeta;
+    return (meta && product && meta[product.id]) || null;
+}
+
+/**
+ * Carga el mapa de los productos que aún no lo tienen (productos cargados en
+ * diferido después del arranque). Una sola llamada RPC para todos los faltantes.
+ */
+export async function ensureProductMeta(pos, orm, products) {
+    if (!pos || !pos.clockyProductMeta || !orm || !pos.pos_session) {
+        return;
+    }
+    const missing = [
+        ...new Set(
+            products
+                .filter((product) => product && !(product.id in pos.clockyProductMeta))
+                .map((product) => product.id)
+        ),
+    ];
+    if (!missing.length) {
+        return;
+    }
+    try {
+        const meta = await orm.call("pos.session", "clocky_get_product_meta", [
+            [pos.pos_session.id],
+            missing,
+        ]);
+        Object.assign(pos.clockyProductMeta, meta);
+    } catch (err) {
+        // Sin red: el resumen usa los campos del producto como respaldo
+        logger.warn("No se pudo cargar el CABYS de los productos:", err);
+    }
+}
@@ -0,0 +1,139 @@
+/** @odoo-module **/
+
+// clocky_pos_summary.js
+import { isLogEnabled, logger } from "@clocky_accounting_integration/js/clocky_pos_logger";
+import { getCabysFromProduct } from "@clocky_accounting_integration/js/clocky_pos_helpers";
+import { getProductCabys } from "@clocky_accounting_integration/js/clocky_pos_product_meta";
+
+/**
+ * Devuelve el nombre de un many2one tanto si viene como [id, "name"]
+ * como si viene como {id, name, display_name}.
+ */
+function m2oName(m2o) {
+    if (!m2o) return null;
+
+    // Formato clásico [id, "Nombre"]
+    if (Array.isArray(m2o)) {
+        return m2o[1] || null;
+    }
+
+    // Formato objeto {id, name, display_name}
+    if (typeof m2o === "object") {
+        return m2o.display_name || m2o.name || null;
+    }
+
+    return null;
+}
+
+/**
+ * Resuelve la moneda del POS de forma robusta.
+ * Busca primero en pos.currency y, si no hay name/display_name,
+ * hace fallback a company.currency_id, pricelist.currency_id o config.currency_id.
+ */
+function resolvePosCurrency(pos) {
+    const p = pos || {};
+    const c = p.currency || {};
+
+    const name =
+        (c.name && String(c.name)) ||
+        (c.display_name && String(c.display_name)) ||
+        m2oName(p.company?.currency_id) ||
+        m2oName(p.pricelist?.currency_id) ||
+        m2oName(p.config?.currency_id) ||
+        null;
+
+    const symbol   = c.symbol || null;
+    const position = c.position || "before";
+    const id       = c.id || 0;
+
+    if (isLogEnabled("debug")) {
+        logger.debug("resolvePosCurrency()", {
+            hasPos: !!pos,
+            rawCurrency: c,
+            companyCurrency: p.company?.currency_id,
+            pricelistCurrency: p.pricelist?.currency_id,
+            configCurrency: p.config?.currency_id,
+            resolved: { id, name, symbol, position },
+        });
+    }
+
+    return { id, name, symbol, position };
+}
+
+/**
+ * Datos del resumen de la venta que muestra el popup tras el cobro.
+ * Solo lee los totales y las líneas de la orden: el payload FE lo arma el
+ * servidor desde pos.order (clocky_pos_send_orders), no el navegador.
+ */
+export function buildPosSummary(order, pos) {
+    if (!order) {
+        logger.warn("buildPosSummary(): order vacío");
+        return null;
+    }
+
+    const envPos = pos || {};
+    const { name: currencyName, symbol: currencySymbol } = resolvePosCurrency(envPos);
+
+    const client =
+        (order.get_partner && order.get_partner()) ||
+        (order.get_client && order.get_client()) ||
+        null;
+
+    const journalName =
+        (envPos.config && envPos.config.journal_id && m2oName(envPos.config.journal_id)) ||
+        (envPos.config && envPos.config.name) ||
+        "POS";
+
+    const invoiceDate = order.validation_date ? new Date(order.validation_date) : new Date();
+
+    // Totales
+    const base = order.get_total_without_tax ? order.get_total_without_tax() : 0;
+    const total = order.get_total_with_tax ? order.get_total_with_tax() : base;
+
+    // --- Líneas ---
+    const orderLines = order.get_orderlines ? order.get_orderlines() : [];
+    const lines = orderLines.map((line) => {
+        const product = line.get_product ? line.get_product() : null;
+        const qty = line.get_quantity ? line.get_quantity() : line.quantity || 0;
+        const unitPrice = line.get_unit_price ? line.get_unit_price() : line.price || 0;
+        const subtotal = line.get_price_without_tax
+            ? line.get_price_without_tax()
+            : qty * unitPrice;
+        let lineTaxes = [];
+        if (line.get_taxes) {
+            try {
+                lineTaxes = line.get_taxes() || [];
+            } catch (e) {
+                lineTaxes = [];
+            }
+        }
+        // CABYS precargado por sesión; si falta, los campos del producto
+        const cabys = getProductCabys(envPos, product);
+        return {
+            description: product ? product.display_name || product.name || "" : "",
+            quantity: qty,
+            price_unit: unitPrice,
+            discount: line.get_discount ? line.get_discount() : line.discount || 0,
+            taxes_display: lineTaxes.map((t) => t.name || "").filter(Boolean).join(", ") || "-",
+            cabys: cabys || getCabysFromProduct(product),
+            subtotal: subtotal,
+            total: line.get_price_with_tax ? line.get_price_with_tax() : subtotal,
+        };
+    });
+
+    return {
+        orderName: order.name || "",
+        clientName: client ? client.name : "Cliente mostrador",
+        journalName,
+        invoiceDateStr: invoiceDate.toLocaleDateString(),
+        // En POS normalmente no hay vencimiento real
+        invoiceDateDueStr: "-",
+        stateLabel: "posted",
+        base,
+        taxes: total - base,
+        total,
+        currencySymbol: currencySymbol || "",
+        currencyName: currencyName || "",
+        lines,
+    };
+}
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Title: FE pipeline benchmark suite
+Description:
+    Runs `tools.benchmark` on synthetic invoices (1 to 1000 lines, 1 to 10k
+    moves) and logs the wall time and SQL query count of every stage, with
+    the HTTP stages against the local GAS stub. The assertions only guard
+    against the regressions the numbers are meant to catch: stages whose
+    query count grows with the number of lines or moves.
+
+    Tagged ``clocky_benchmark`` and excluded from the standard run:
+
+        odoo-bin -d <db> -u clocky_accounting_integration --stop-after-init \\
+            --test-tags clocky_benchmark
+"""
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools import benchmark
+
+STAGES = {"compute_cabys", "build_payloads", "serialize", "preview_first_page",
+          "pos_post_to_gas", "outbox_send"}
+
+# Stages that read their data in bulk (prefetch): no query per line or move
+BULK_STAGES = ("compute_cabys", "build_payloads", "preview_first_page")
+
+
+@tagged("clocky_benchmark", "-standard")
+class TestClockyBenchmark(TransactionCase):
+
+    def _queries(self, results, stage):
+        """Query counts of `stage`, in scenario order."""
+        return [row["queries"] for row in results if row["stage"] == stage]
+
+    def test_lines_per_invoice(self):
+        """1, 100 and 1000 lines on a single invoice."""
+        results = benchmark.run(self.env, scenarios=[(1, 1), (1, 100), (1, 1000)], n_products=20)
+        self.assertEqual({row["stage"] for row in results}, STAGES)
+        for stage in BULK_STAGES:
+            small, _medium, large = self._queries(results, stage)
+            self.assertLessEqual(large, small + 10, "%s: queries grow with the number of lines" % stage)
+
+    def test_invoices_per_batch(self):
+        """1, 100 and 1000 invoices of 5 lines."""
+        results = benchmark.run(self.env, scenarios=[(1, 5), (100, 5), (1000, 5)], n_products=20)
+        for stage in ("compute_cabys", "build_payloads"):
+            small, _medium, large = self._queries(results, stage)
+            self.assertLess(large, small + 100, "%s: queries grow with the number of invoices" % stage)
+
+    def test_ten_thousand_invoices(self):
+        """10k single-line invoices, the upper bound of the suite."""
+        results = benchmark.run(self.env, scenarios=[(10000, 1)], n_products=20)
+        self.assertEqual({row["stage"] for row in results}, STAGES)
+        (queries,) = self._queries(results, "build_payloads")
+        self.assertLess(queries, 1000, "build_payloads: queries grow with the number of invoices")
+
+    def test_local_numbering_untouched(self):
+        """The benchmark never draws real Hacienda consecutivos."""
+        self.env["ir.config_parameter"].sudo().set_param("clocky.fe_local_numbering", "1")
+        reserved = []
+
+        def _reserve(numbering, *args):
+            reserved.append(args)
+            return []
+
+        self.patch(type(self.env["clocky.fe.numbering"]), "_reserve", _reserve)
+        benchmark.run(self.env, scenarios=[(2, 2)], n_products=5, report=False)
+        self.assertFalse(reserved)
+        self.assertTrue(self.env["clocky.settings"]._get("fe_local_numbering"))
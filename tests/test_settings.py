@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky settings round trip
+Description:
+    Saves the Clocky FE options through Settings (`res.config.settings`) and
+    reads them back through `clocky.settings`, the way the senders do. A
+    numeric field left at 0 is stored as an unset parameter by Odoo, so the
+    options that switch a feature off must survive the round trip on their
+    own boolean parameter.
+"""
+
+from odoo.tests import TransactionCase, tagged
+
+from ..tools import transport
+
+
+@tagged("post_install", "-at_install")
+class TestClockySettings(TransactionCase):
+
+    def _save(self, **values):
+        self.env["res.config.settings"].create(values).execute()
+        return self.env["clocky.settings"]._get_all()
+
+    def test_zero_numeric_reads_back_default(self):
+        """Saving 0 in a numeric field does not store 0: the default comes back."""
+        settings = self._save(clocky_breaker_failures=0, clocky_http_timeout_factor=0.0)
+        self.assertEqual(settings["breaker_failures"], 5)
+        self.assertEqual(settings["http_timeout_factor"], 3.0)
+
+    def test_disable_breaker_and_adaptive_timeout(self):
+        settings = self._save(
+            clocky_breaker_disabled=True, clocky_http_timeout_fixed=True, clocky_http_read_timeout=12.0,
+        )
+        self.assertTrue(settings["breaker_disabled"])
+        self.assertTrue(settings["http_timeout_fixed"])
+        options = transport.options_from_settings(settings, stage="invoice.http_send")
+        self.assertIsNone(options["circuit"])
+        self.assertEqual(options["read_timeout"], 12.0)
+
+        settings = self._save(clocky_breaker_disabled=False, clocky_http_timeout_fixed=False)
+        self.assertFalse(settings["breaker_disabled"])
+        options = transport.options_from_settings(settings, stage="invoice.http_send")
+        self.assertEqual(options["circuit"], (settings["breaker_failures"], settings["breaker_cooldown"]))
+
+    def test_send_log_keep_forever(self):
+        log = self.env["clocky.fe.send.log"]._log_sends([{"source": "invoice", "ok": True, "body": "{}"}])
+        self.env.cr.execute(
+            "UPDATE clocky_fe_send_log SET date = now() - interval '400 days' WHERE id = %s", [log.id],
+        )
+        settings = self._save(clocky_send_log_keep_forever=True, clocky_send_log_retention_days=0)
+        self.assertTrue(settings["send_log_keep_forever"])
+        log._cron_gc_send_log()
+        self.assertTrue(log.exists())
+
+        self._save(clocky_send_log_keep_forever=False)
+        log._cron_gc_send_log()
+        self.assertFalse(log.exists())
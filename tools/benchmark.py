@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Title: FE pipeline benchmarks
+Description:
+    Regression numbers (wall time and SQL query count per stage) for the
+    electronic-invoice pipeline, measured on synthetic invoices:
+
+      - compute_cabys      `account.move.line._compute_cabys` on all lines
+      - build_payloads     `account.move._clocky_build_payloads`
+      - serialize          `transport.dumps` of every payload (compact JSON)
+      - preview_first_page preview wizard: open it and render the first page
+                           of lines (largest invoice)
+      - pos_post_to_gas    `clocky.pos.integration.clocky_pos_post_to_gas`
+      - outbox_send        enqueue + `clocky.fe.outbox._send`
+
+    The HTTP stages run against the local GAS stand-in (`tools.gas_stub`).
+    Everything happens inside a savepoint that is rolled back at the end,
+    so the database is left untouched. Local Hacienda numbering
+    (`clocky.fe_local_numbering`) is forced off for the run: a PostgreSQL
+    sequence is not rolled back, so real consecutivos would be lost.
+
+    The suite runs as Odoo tests tagged ``clocky_benchmark`` (not part of the
+    standard run, see `tests/test_benchmark.py`):
+
+        odoo-bin -d <db> -u clocky_accounting_integration --stop-after-init \\
+            --test-tags clocky_benchmark
+
+    or from an Odoo shell:
+
+        odoo-bin shell -d <db> --no-http <<'EOF'
+        from odoo.addons.clocky_accounting_integration.tools import benchmark
+        benchmark.run(env, scenarios=[(1, 1000), (1000, 5), (10000, 1)])
+        EOF
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+
+from . import gas_stub, transport
+
+_logger = logging.getLogger(__name__)
+
+# (number of moves, lines per move)
+DEFAULT_SCENARIOS = ((1, 1), (1, 100), (1, 1000), (100, 10), (1000, 5))
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def _measure(env, results, stage, moves, lines):
+    """Time a stage with cold ORM caches and count the SQL queries it runs."""
+    env.flush_all()
+    env.invalidate_all()
+    queries = env.cr.sql_log_count
+    start = time.perf_counter()
+    yield
+    env.flush_all()
+    results.append({
+        "stage": stage,
+        "moves": moves,
+        "lines": lines,
+        "ms": round((time.perf_counter() - start) * 1000.0, 1),
+        "queries": env.cr.sql_log_count - queries,
+    })
+
+
+def _create_invoices(env, n_moves, n_lines, products, partner):
+    tax = env.company.account_sale_tax_id
+    vals_list = []
+    for i in range(n_moves):
+        vals_list.append({
+            "move_type": "out_invoice",
+            "partner_id": partner.id,
+            "invoice_line_ids": [
+                (0, 0, {
+                    "product_id": products[(i + j) % len(products)].id,
+                    "quantity": 1 + j % 5,
+                    "price_unit": 1000.0 + j,
+                    "tax_ids": [(6, 0, tax.ids)],
+                })
+                for j in range(n_lines)
+            ],
+        })
+    return env["account.move"].create(vals_list)
+
+
+def _run_scenario(env, n_moves, n_lines, products, partner, results):
+    moves = _create_invoices(env, n_moves, n_lines, products, partner)
+    lines = moves.invoice_line_ids
+    n_total = len(lines)
+
+    with _measure(env, results, "compute_cabys", n_moves, n_total):
+        lines.mapped("cabys")
+
+    with _measure(env, results, "build_payloads", n_moves, n_total):
+        payloads = moves._clocky_build_payloads()
+
+    with _measure(env, results, "serialize", n_moves, n_total):
+        for payload in payloads.values():
+            transport.dumps(payload)
+
+    largest = max(moves, key=lambda m: len(m.invoice_line_ids))
+    with _measure(env, results, "preview_first_page", 1, len(largest.invoice_line_ids)):
+        wizard = env["account.invoice.preview.wizard"].with_context(active_id=largest.id).create({})
+        wizard.lines_html
+
+    with _measure(env, results, "pos_post_to_gas", n_moves, n_total):
+        env["clocky.pos.integration"].clocky_pos_post_to_gas(list(payloads.values()))
+
+    with _measure(env, results, "outbox_send", n_moves, n_total):
+        env["clocky.fe.outbox"]._enqueue_moves(moves)._send()
+
+
+def _log_report(results):
+    header = "%-22s %8s %8s %12s %9s" % ("stage", "moves", "lines", "wall (ms)", "queries")
+    rows = [header, "-" * len(header)]
+    for row in results:
+        rows.append("%-22s %8s %8s %12.1f %9s" % (
+            row["stage"], row["moves"], row["lines"], row["ms"], row["queries"],
+        ))
+    _logger.info("Clocky FE benchmark:\n%s", "\n".join(rows))
+
+
+def run(env, scenarios=DEFAULT_SCENARIOS, n_products=50, latency=0.0, report=True):
+    """Run the benchmarks and return one result dict per (scenario, stage).
+
+    `latency` (seconds) is added by the GAS stub to every request. With
+    `report` the table of results is written to the log.
+    """
+    results = []
+    stub = gas_stub.start(latency=latency)
+    try:
+        with env.cr.savepoint():
+            params = env["ir.config_parameter"].sudo()
+            params.set_param("clocky.pos_post_url", stub.url)
+            params.set_param("clocky.facturar_post_url", stub.url)
+            params.set_param("clocky.fe_local_numbering", "0")
+            partner = env["res.partner"].create({"name": "Clocky Bench Customer", "vat": "3101000000"})
+            products = env["product.product"].create([
+                {"name": "Clocky Bench Product %s" % i, "default_code": "BENCH%04d" % i}
+                for i in range(n_products)
+            ])
+            for n_moves, n_lines in scenarios:
+                _run_scenario(env, n_moves, n_lines, products, partner, results)
+            # Leave the database exactly as it was
+            raise _Rollback()
+    except _Rollback:
+        pass
+    finally:
+        stub.shutdown()
+        stub.server_close()
+        env.invalidate_all()
+        # The settings cached inside the savepoint (stub URLs) are gone with it
+        env.registry.clear_cache()
+
+    if report:
+        _log_report(results)
+    return results
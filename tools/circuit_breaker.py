@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Circuit breaker for the GAS endpoints
+Description:
+    Stops an Apps Script outage from tying up every Odoo worker for a full
+    read timeout per document.
+
+    One breaker per host, shared by every sender of the process (invoice
+    outbox, preview wizard, POS):
+
+      - closed     requests go through; `failure_threshold` consecutive
+                   failures (network errors, timeouts, HTTP 5xx/429) open it
+      - open       requests fail at once with `transport.CircuitOpenError`
+                   (a `TransportError`, so the callers take their usual
+                   retry path) until `reset_timeout` seconds have elapsed
+      - half-open  a single probe request is let through: success closes
+                   the breaker, failure opens it again for another period
+
+    The state lives in the memory of each Odoo process (like `tools.metrics`):
+    with several workers each one trips on its own failures.
+
+    `adaptive_timeout` derives the read timeout from the observed latency
+    (p99 of the send stage times a safety factor), within bounds, so a
+    healthy endpoint is not waited on for the full configured timeout.
+"""
+
+import os
+import threading
+import time
+
+from . import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Minimum samples of a stage before its latency is trusted for the timeout
+ADAPTIVE_MIN_SAMPLES = 20
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now (False: short-circuit it)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.retry_in() <= 0:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                # This request is the probe
+                self._probing = True
+                return True
+            return False
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 when closed)."""
+        if self.state == CLOSED:
+            return 0.0
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    metrics.count_error("circuit.%s" % self.name, "Opened")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures, "retry_in": self.retry_in()}
+
+
+_breakers = {}
+_lock = threading.Lock()
+
+
+def get(name, failure_threshold=5, reset_timeout=30.0):
+    """Return the breaker `name` of this process, updating its thresholds."""
+    with _lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+    breaker.failure_threshold = failure_threshold
+    breaker.reset_timeout = reset_timeout
+    return breaker
+
+
+def reset():
+    with _lock:
+        _breakers.clear()
+
+
+def snapshot():
+    """Return the state of every breaker of this process."""
+    with _lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
+
+
+def to_prometheus():
+    """Return the breaker states in the Prometheus text format (1 = open, 0.5 = half-open)."""
+    values = {CLOSED: 0, HALF_OPEN: 0.5, OPEN: 1}
+    out = [
+        "# HELP clocky_fe_circuit_state State of the GAS circuit breakers (0 closed, 0.5 half-open, 1 open).",
+        "# TYPE clocky_fe_circuit_state gauge",
+    ]
+    for name, state in snapshot().items():
+        out.append('clocky_fe_circuit_state{host="%s",pid="%s"} %s' % (name, os.getpid(), values[state["state"]]))
+    return "\n".join(out) + "\n"
+
+
+def adaptive_timeout(stage, configured, minimum=5.0, factor=3.0, q=0.99):
+    """Return a read timeout for `stage`: ``factor`` times its `q` latency, within bounds.
+
+    Falls back to `configured` (also the upper bound) until the stage has
+    `ADAPTIVE_MIN_SAMPLES` samples.
+    """
+    if metrics.sample_count(stage) < ADAPTIVE_MIN_SAMPLES:
+        return configured
+    latency = metrics.quantile(stage, q)
+    if latency is None:
+        return configured
+    return min(max(latency * factor, minimum), configured)
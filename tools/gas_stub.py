@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Local GAS stand-in server
+Description:
+    Minimal HTTP server emulating the Google Apps Script Web App contract
+    used by the Clocky senders, so that the send paths can be exercised
+    without a live GAS deployment:
+
+      - POST a JSON object  -> ``{"ok": true, "id": <invoice.id>, ...}``
+      - POST a JSON array   -> one result per document, in the same order
+      - POST ``{"action": "status", "documents": [...]}`` (or any POST to
+        ``/status``) -> the Hacienda status of each document (`hacienda_status`,
+        "aceptado" by default), see `account.move._cron_clocky_poll_fe_status`
+      - gzip (`Content-Encoding: gzip`) and chunked
+        (`Transfer-Encoding: chunked`) request bodies are accepted
+      - GET ``/stats`` -> request / document / error counters and the peak
+        number of requests in flight
+
+    Faults can be injected to rehearse outages and slow deployments:
+    `latency` plus a random `jitter` (uniform, seconds) per request, an
+    `error_rate` of requests answered with HTTP 500, and a `reject_rate` of
+    documents answered with ``"ok": false``. `seed` makes the faults
+    reproducible.
+
+    Only the standard library is used. It can be started in-process
+    (`start()`, used by `tools.benchmark`) or from the command line:
+
+        python3 tools/gas_stub.py --port 8069 --latency-ms 300 --jitter-ms 200 --error-rate 0.02
+
+    See `tools/replay.py` to load-test Odoo's send paths against it.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GasStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_chunked(self):
+        parts = []
+        while True:
+            size = int(self.rfile.readline().split(b";", 1)[0].strip() or b"0", 16)
+            if not size:
+                # Trailer section, up to the final empty line
+                while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(parts)
+            parts.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _read_json(self):
+        if (self.headers.get("Transfer-Encoding") or "").lower() == "chunked":
+            data = self._read_chunked()
+        else:
+            data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if (self.headers.get("Content-Encoding") or "").lower() == "gzip":
+            data = gzip.decompress(data)
+        return json.loads(data or b"null")
+
+    def _reply(self, status, document):
+        body = json.dumps(document).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _result(self, document):
+        invoice = document.get("invoice", {}) if isinstance(document, dict) else {}
+        if self.server.chance(self.server.reject_rate):
+            with self.server.lock:
+                self.server.rejected += 1
+            return {"ok": False, "id": invoice.get("id"), "error": "Documento rechazado (stub)"}
+        return {"ok": True, "id": invoice.get("id"), "name": invoice.get("name")}
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._reply(200, self.server.stats())
+        else:
+            self._reply(404, {"ok": False, "error": "Not found"})
+
+    def _status_results(self, document):
+        documents = document.get("documents") or [] if isinstance(document, dict) else []
+        return [
+            {"id": item.get("id"), "status": self.server.hacienda_status, "message": ""}
+            for item in documents if isinstance(item, dict)
+        ]
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.inflight += 1
+            self.server.max_inflight = max(self.server.max_inflight, self.server.inflight)
+        try:
+            self._handle_post()
+        finally:
+            with self.server.lock:
+                self.server.inflight -= 1
+
+    def _handle_post(self):
+        try:
+            document = self._read_json()
+        except ValueError as e:
+            self._reply(400, {"ok": False, "error": "JSON inválido: %s" % e})
+            return
+        delay = self.server.delay()
+        if delay:
+            time.sleep(delay)
+        if self.path.rstrip("/").endswith("/status") or (
+            isinstance(document, dict) and document.get("action") == "status"
+        ):
+            with self.server.lock:
+                self.server.status_requests += 1
+            self._reply(200, {"results": self._status_results(document)})
+            return
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.documents += len(document) if isinstance(document, list) else 1
+        if self.server.chance(self.server.error_rate):
+            with self.server.lock:
+                self.server.errors += 1
+            self._reply(500, {"ok": False, "error": "Error simulado del GAS (stub)"})
+            return
+        if isinstance(document, list):
+            self._reply(200, [self._result(item) for item in document])
+        else:
+            self._reply(200, self._result(document))
+
+
+class GasStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, verbose=False, hacienda_status="aceptado",
+                 jitter=0.0, error_rate=0.0, reject_rate=0.0, seed=None):
+        super().__init__(address, GasStubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.verbose = verbose
+        self.hacienda_status = hacienda_status
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.documents = 0
+        self.status_requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+    def chance(self, rate):
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        """Latency of one request: `latency` plus up to `jitter` seconds."""
+        if not self.jitter:
+            return self.latency
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "documents": self.documents,
+                "status_requests": self.status_requests,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "inflight": self.inflight,
+                "max_inflight": self.max_inflight,
+            }
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return "http://%s:%s/exec" % (host, port)
+
+
+def start(host="127.0.0.1", port=0, latency=0.0, verbose=False, **options):
+    """Start a stub server in a background thread and return it (see `.url`).
+
+    `options`: `jitter`, `error_rate`, `reject_rate`, `seed`, `hacienda_status`.
+    """
+    server = GasStubServer((host, port), latency=latency, verbose=verbose, **options)
+    threading.Thread(target=server.serve_forever, name="clocky-gas-stub", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local GAS stand-in for Clocky FE.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="random extra latency per request, up to this value")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--reject-rate", type=float, default=0.0,
+                        help='fraction of documents answered with "ok": false')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--hacienda-status", default="aceptado",
+                        help="status answered to the status queries (aceptado, rechazado, procesando)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    server = GasStubServer(
+        (args.host, args.port), latency=args.latency_ms / 1000.0, verbose=args.verbose,
+        hacienda_status=args.hacienda_status, jitter=args.jitter_ms / 1000.0,
+        error_rate=args.error_rate, reject_rate=args.reject_rate, seed=args.seed,
+    )
+    print("GAS stub listening on %s" % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Title: FE pipeline metrics
+Description:
+    In-process latency histograms and error counters for the stages of the
+    electronic-invoice pipeline (payload build, serialization, HTTP send,
+    response parse), for both the invoice and the POS paths.
+
+    Usage:
+        with metrics.timed("invoice.http_send"):
+            ...
+
+    An exception raised inside `timed` is counted as an error of the stage
+    (by exception class) and re-raised; exceptions flagged with
+    ``metrics_sample = False`` (no request was made, e.g. an open circuit
+    breaker) add no duration sample. Percentiles (p50/p95/p99) are computed
+    over the last `WINDOW` samples of each stage; the histogram buckets are
+    cumulative since the process started, Prometheus-style.
+
+    Metrics live in the memory of each Odoo process: with several workers,
+    every worker exposes its own numbers (see the `pid` in the export).
+    They are exported by the `/clocky/fe/metrics` controller.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 2048
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageStats:
+    """Counters, cumulative histogram and recent samples of one stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.errors = {}
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=WINDOW)
+
+    def observe(self, seconds, error=None):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def quantile(self, q):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+
+_stages = {}
+_lock = threading.Lock()
+
+
+def observe(stage, seconds, error=None):
+    """Record one sample of `stage` (`error`: error type name, if it failed)."""
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = StageStats()
+        stats.observe(seconds, error)
+
+
+def count_error(stage, error):
+    """Count an error of `stage` that has no duration sample of its own."""
+    with _lock:
+        stats = _stages.get(stage)
+        if stats is None:
+            stats = _stages[stage] = StageStats()
+        stats.errors[error] = stats.errors.get(error, 0) + 1
+
+
+@contextmanager
+def timed(stage):
+    """Measure the wall time of the block as one sample of `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        if getattr(e, "metrics_sample", True):
+            observe(stage, time.perf_counter() - start, error=e.__class__.__name__)
+        else:
+            count_error(stage, e.__class__.__name__)
+        raise
+    observe(stage, time.perf_counter() - start)
+
+
+def quantile(stage, q):
+    """Return the `q` quantile (seconds) of the recent samples of `stage`, or None."""
+    with _lock:
+        stats = _stages.get(stage)
+        return stats.quantile(q) if stats else None
+
+
+def sample_count(stage):
+    """Return the number of recent samples of `stage` (at most `WINDOW`)."""
+    with _lock:
+        stats = _stages.get(stage)
+        return len(stats.samples) if stats else 0
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+
+
+def snapshot():
+    """Return a JSON-serializable view of all the stages."""
+    with _lock:
+        stages = {}
+        for stage, stats in sorted(_stages.items()):
+            stages[stage] = {
+                "count": stats.count,
+                "sum_seconds": stats.total,
+                "errors": sum(stats.errors.values()),
+                "errors_by_type": dict(stats.errors),
+                "p50": stats.quantile(0.5),
+                "p95": stats.quantile(0.95),
+                "p99": stats.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in BUCKETS], stats.buckets)),
+            }
+    return {"pid": os.getpid(), "stages": stages}
+
+
+def to_prometheus():
+    """Return the metrics in the Prometheus text exposition format (0.0.4)."""
+    data = snapshot()
+    pid = data["pid"]
+    out = [
+        "# HELP clocky_fe_stage_duration_seconds Duration of the FE pipeline stages.",
+        "# TYPE clocky_fe_stage_duration_seconds histogram",
+    ]
+    for stage, s in data["stages"].items():
+        labels = 'stage="%s",pid="%s"' % (stage, pid)
+        for bound, count in s["buckets"].items():
+            out.append('clocky_fe_stage_duration_seconds_bucket{%s,le="%s"} %d' % (labels, bound, count))
+        out.append('clocky_fe_stage_duration_seconds_bucket{%s,le="+Inf"} %d' % (labels, s["count"]))
+        out.append("clocky_fe_stage_duration_seconds_sum{%s} %.6f" % (labels, s["sum_seconds"]))
+        out.append("clocky_fe_stage_duration_seconds_count{%s} %d" % (labels, s["count"]))
+
+    out += [
+        "# HELP clocky_fe_stage_latency_seconds Recent latency quantiles of the FE pipeline stages.",
+        "# TYPE clocky_fe_stage_latency_seconds gauge",
+    ]
+    for stage, s in data["stages"].items():
+        for q in QUANTILES:
+            value = s["p%d" % round(q * 100)]
+            if value is not None:
+                out.append('clocky_fe_stage_latency_seconds{stage="%s",pid="%s",quantile="%s"} %.6f'
+                           % (stage, pid, q, value))
+
+    out += [
+        "# HELP clocky_fe_stage_errors_total Errors of the FE pipeline stages, by type.",
+        "# TYPE clocky_fe_stage_errors_total counter",
+    ]
+    for stage, s in data["stages"].items():
+        for error, count in sorted(s["errors_by_type"].items()):
+            out.append('clocky_fe_stage_errors_total{stage="%s",pid="%s",type="%s"} %d'
+                       % (stage, pid, error, count))
+    return "\n".join(out) + "\n"
@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Replay load-testing harness
+Description:
+    Replays recorded FE payloads against a running Odoo at a target rate,
+    through its send paths, to size the number of Odoo workers:
+
+      - pos     `clocky.pos.integration.clocky_pos_post_to_gas` (one payload,
+                or `--batch` payloads, per call)
+      - orders  `clocky.pos.integration.clocky_pos_send_orders` (the file
+                holds POS order references instead of payloads)
+      - outbox  each call creates `--batch` `clocky.fe.outbox` records for
+                the invoices of the payloads and triggers the outbox cron
+                (`action_retry`); the cron workers of the Odoo under test
+                do the sends. After the run the harness waits up to
+                `--drain-timeout` seconds for the queue to drain and
+                reports its throughput and queue time (creation to done,
+                one second resolution)
+
+    Sends already acknowledged with the same content are answered from the
+    `clocky_fe_sent_hash` cache without reaching GAS. So that every call
+    measures a real send, each replayed POS payload gets a unique ``orden``
+    (``<orden>-r<n>``). Order references cannot be renamed: in `orders` mode
+    a reference replayed after its first send is counted as ``cached``.
+
+    Calls are scheduled open-loop at `--rps` calls per second (a slow Odoo
+    does not slow the load down), each on its own thread up to
+    `--max-inflight`. Latency is measured from the scheduled start, so
+    queueing in front of busy workers is counted (no coordinated omission).
+
+    Report: calls and documents sent, results ok / cached / failed by error type,
+    achieved throughput, latency percentiles, and worker occupancy: the
+    mean number of calls in flight (throughput x mean latency, Little's
+    law) and its peak, compared with `--workers`. An occupancy close to the
+    worker count means Odoo is saturated at that rate.
+
+    Point the GAS URLs of the test database (`clocky.pos_post_url`,
+    `clocky.facturar_post_url`) to the local stand-in (`tools/gas_stub.py`)
+    to reproduce the GAS latency and failure rates without a live
+    deployment; with `--stub-url` its counters are added to the report.
+
+    Recording: `export_payloads(env, path)` writes the payloads stored in
+    `clocky.fe.outbox` as JSON lines (replayable in the `pos` and `outbox`
+    modes), from an Odoo shell:
+
+        from odoo.addons.clocky_accounting_integration.tools import replay
+        replay.export_payloads(env, "/tmp/payloads.jsonl", limit=5000)
+
+    Replay (standard library only):
+
+        python3 tools/gas_stub.py --port 8765 --latency-ms 800 --jitter-ms 400 --error-rate 0.01
+        python3 tools/replay.py --url http://localhost:8069 --db prod_copy \\
+            --login admin --password admin --payloads /tmp/payloads.jsonl \\
+            --rps 20 --duration 120 --workers 8 --stub-url http://127.0.0.1:8765
+        python3 tools/replay.py ... --mode outbox --batch 10 --rps 2 --drain-timeout 600
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    "pos": "clocky_pos_post_to_gas",
+    "orders": "clocky_pos_send_orders",
+    "outbox": "action_retry",
+}
+DRAIN_POLL_INTERVAL = 2.0
+
+
+def export_payloads(env, path, limit=1000):
+    """Write the last `limit` payloads of `clocky.fe.outbox` to `path` (JSON lines)."""
+    env.cr.execute(
+        "SELECT payload FROM clocky_fe_outbox ORDER BY id DESC LIMIT %s", [limit],
+    )
+    count = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for (payload,) in env.cr.fetchall():
+            out.write(payload.replace("\n", " ") + "\n")
+            count += 1
+    return count
+
+
+def load_items(path):
+    """Read the payloads (JSON objects) or order references (strings) of a JSON lines file."""
+    items = []
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            line = line.strip()
+            if line:
+                items.append(json.loads(line) if line[0] in "{[\"" else line)
+    if not items:
+        raise SystemExit("%s holds no payloads" % path)
+    return items
+
+
+def quantile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class OdooClient:
+    """Minimal JSON-RPC client for an Odoo web session."""
+
+    def __init__(self, url, db, login, password, timeout=300.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.session_id = None
+        result = self._rpc("/web/session/authenticate", {"db": db, "login": login, "password": password})
+        if not result.get("uid"):
+            raise SystemExit("Authentication failed for %s on %s" % (login, db))
+
+    def _rpc(self, path, params):
+        body = json.dumps({"jsonrpc": "2.0", "method": "call", "id": 1, "params": params}).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if self.session_id:
+            request.add_header("Cookie", "session_id=%s" % self.session_id)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            for header in response.headers.get_all("Set-Cookie") or []:
+                if header.startswith("session_id="):
+                    self.session_id = header.split(";", 1)[0].split("=", 1)[1]
+            data = json.loads(response.read())
+        if data.get("error"):
+            error = data["error"].get("data", {}).get("name") or data["error"].get("message")
+            raise RuntimeError(error or "RPC error")
+        return data.get("result")
+
+    def call(self, model, method, *args, **kwargs):
+        return self._rpc(
+            "/web/dataset/call_kw/%s/%s" % (model, method),
+            {"model": model, "method": method, "args": list(args), "kwargs": kwargs},
+        )
+
+
+class Recorder:
+    """Thread-safe collection of the call outcomes and of the calls in flight."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.results = {}
+        self.documents = 0
+        self.inflight = 0
+        self.max_inflight = 0
+        self.outbox_ids = []
+
+    def start(self):
+        with self.lock:
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+
+    def finish(self, latency, outcomes, documents, outbox_ids=()):
+        with self.lock:
+            self.outbox_ids.extend(outbox_ids)
+            self.inflight -= 1
+            self.latencies.append(latency)
+            self.documents += documents
+            for outcome in outcomes:
+                self.results[outcome] = self.results.get(outcome, 0) + 1
+
+
+def _outcomes(result, count):
+    """One outcome label per document: "ok" or the error type."""
+    results = result if isinstance(result, list) else [result]
+    labels = []
+    for item in results[:count]:
+        if isinstance(item, dict) and item.get("ok"):
+            labels.append("cached" if item.get("cached") else "ok")
+        else:
+            labels.append((isinstance(item, dict) and item.get("error_type")) or "Error")
+    return labels + ["MissingResult"] * (count - len(labels))
+
+
+def _unique(item, n):
+    """`item` with a unique ``orden`` (POS payloads), so the sent-hash cache never answers it."""
+    if isinstance(item, dict) and item.get("orden"):
+        return dict(item, orden="%s-r%s" % (item["orden"], n))
+    return item
+
+
+def _send(client, method, items, scheduled, recorder):
+    recorder.start()
+    try:
+        argument = items if len(items) > 1 or method == MODES["orders"] else items[0]
+        outcomes = _outcomes(client.call("clocky.pos.integration", method, argument), len(items))
+    except (urllib.error.URLError, OSError, RuntimeError, ValueError) as e:
+        outcomes = ["RPC:%s" % e.__class__.__name__] * len(items)
+    recorder.finish(time.perf_counter() - scheduled, outcomes, len(items))
+
+
+def _payload_hash(payload):
+    """Same digest as `models.clocky_fe_outbox.payload_hash` (this script runs outside Odoo)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _enqueue(client, items, scheduled, recorder):
+    """Create outbox records for the invoices of `items` and trigger the outbox cron.
+
+    The records carry the hash of their payload, like the ones `_enqueue_moves`
+    creates: the acknowledgement written back on the move stays consistent.
+    """
+    recorder.start()
+    ids = []
+    # Only invoice payloads (POS payloads carry an "orden" and a pos.order id)
+    invoices = [
+        item for item in items
+        if isinstance(item, dict) and not item.get("orden") and (item.get("invoice") or {}).get("id")
+    ]
+    try:
+        if invoices:
+            vals_list = [
+                {
+                    "move_id": item["invoice"]["id"],
+                    "payload": json.dumps(item, separators=(",", ":"), ensure_ascii=False),
+                    "payload_hash": _payload_hash(item),
+                }
+                for item in invoices
+            ]
+            ids = client.call("clocky.fe.outbox", "create", vals_list)
+            ids = ids if isinstance(ids, list) else [ids]
+            client.call("clocky.fe.outbox", MODES["outbox"], ids)
+        outcomes = ["enqueued"] * len(invoices) + ["NotAnInvoicePayload"] * (len(items) - len(invoices))
+    except (urllib.error.URLError, OSError, RuntimeError, ValueError) as e:
+        outcomes = ["RPC:%s" % e.__class__.__name__] * len(items)
+    recorder.finish(time.perf_counter() - scheduled, outcomes, len(items), ids)
+
+
+def _parse_datetime(value):
+    return time.mktime(time.strptime(value, "%Y-%m-%d %H:%M:%S"))
+
+
+def drain(client, ids, timeout=300.0):
+    """Wait until the outbox records `ids` are no longer pending (or `timeout`).
+
+    Returns their states, the drain throughput and the queue time percentiles.
+    """
+    start = time.perf_counter()
+    rows = []
+    while True:
+        rows = client.call(
+            "clocky.fe.outbox", "search_read", [("id", "in", ids)],
+            fields=["state", "attempts", "create_date", "write_date"],
+        ) if ids else []
+        pending = [row for row in rows if row["state"] == "pending" and not row["attempts"]]
+        if not pending or time.perf_counter() - start >= timeout:
+            break
+        time.sleep(DRAIN_POLL_INTERVAL)
+    states = {}
+    for row in rows:
+        states[row["state"]] = states.get(row["state"], 0) + 1
+    settled = [row for row in rows if row["state"] == "done"]
+    queue = sorted(_parse_datetime(row["write_date"]) - _parse_datetime(row["create_date"]) for row in settled)
+    span = (
+        max(_parse_datetime(row["write_date"]) for row in settled)
+        - min(_parse_datetime(row["create_date"]) for row in settled)
+    ) if settled else 0.0
+    return {
+        "records": len(rows),
+        "states": dict(sorted(states.items())),
+        "waited": time.perf_counter() - start,
+        "throughput": len(settled) / span if span else None,
+        "queue": {
+            "p50": quantile(queue, 0.5),
+            "p95": quantile(queue, 0.95),
+            "p99": quantile(queue, 0.99),
+            "max": queue[-1] if queue else None,
+        },
+    }
+
+
+def run(client, items, mode="pos", rps=10.0, duration=60.0, batch=1, max_inflight=64, drain_timeout=300.0):
+    """Replay `items` (cycled) at `rps` calls per second for `duration` seconds.
+
+    Returns the report dict (see `print_report`).
+    """
+    method = MODES[mode]
+    recorder = Recorder()
+    source = (_unique(item, n) for n, item in enumerate(itertools.cycle(items)))
+    interval = 1.0 / rps
+    calls = int(rps * duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="clocky-replay") as pool:
+        for i in range(calls):
+            scheduled = start + i * interval
+            wait = scheduled - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            chunk = [next(source) for _n in range(batch)]
+            if mode == "outbox":
+                pool.submit(_enqueue, client, chunk, scheduled, recorder)
+            else:
+                pool.submit(_send, client, method, chunk, scheduled, recorder)
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(recorder.latencies)
+    busy = sum(ordered)
+    return {
+        "mode": mode,
+        "target_rps": rps,
+        "calls": len(ordered),
+        "documents": recorder.documents,
+        "elapsed": elapsed,
+        "throughput_calls": len(ordered) / elapsed if elapsed else 0.0,
+        "throughput_documents": recorder.documents / elapsed if elapsed else 0.0,
+        "results": dict(sorted(recorder.results.items())),
+        "latency": {
+            "mean": busy / len(ordered) if ordered else None,
+            "p50": quantile(ordered, 0.5),
+            "p95": quantile(ordered, 0.95),
+            "p99": quantile(ordered, 0.99),
+            "max": ordered[-1] if ordered else None,
+        },
+        "occupancy_mean": busy / elapsed if elapsed else 0.0,
+        "occupancy_peak": recorder.max_inflight,
+        "drain": drain(client, recorder.outbox_ids, drain_timeout) if mode == "outbox" else None,
+    }
+
+
+def fetch_stub_stats(stub_url):
+    try:
+        with urllib.request.urlopen(stub_url.rstrip("/") + "/stats", timeout=5) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def print_report(report, workers=None, stub_stats=None):
+    def ms(value):
+        return "%9.1f ms" % (value * 1000.0) if value is not None else "        -"
+
+    print("mode              %s (%s calls/s target)" % (report["mode"], report["target_rps"]))
+    print("calls / documents %s / %s in %.1f s" % (report["calls"], report["documents"], report["elapsed"]))
+    print("throughput        %.2f calls/s, %.2f documents/s"
+          % (report["throughput_calls"], report["throughput_documents"]))
+    for outcome, count in report["results"].items():
+        print("  %-16s %s" % (outcome, count))
+    latency = report["latency"]
+    print("latency           mean %s  p50 %s  p95 %s  p99 %s  max %s" % (
+        ms(latency["mean"]), ms(latency["p50"]), ms(latency["p95"]), ms(latency["p99"]), ms(latency["max"]),
+    ))
+    line = "occupancy         mean %.2f calls in flight, peak %s" % (
+        report["occupancy_mean"], report["occupancy_peak"],
+    )
+    if workers:
+        line += " (%.0f%% / %.0f%% of %s workers)" % (
+            100.0 * report["occupancy_mean"] / workers, 100.0 * report["occupancy_peak"] / workers, workers,
+        )
+    print(line)
+    outbox = report.get("drain")
+    if outbox:
+        states = ", ".join("%s %s" % (count, state) for state, count in outbox["states"].items())
+        throughput = outbox["throughput"]
+        print("outbox drain      %s records (%s) after %.1f s, %s documents/s" % (
+            outbox["records"], states or "-", outbox["waited"],
+            "%.2f" % throughput if throughput is not None else "-",
+        ))
+        queue = outbox["queue"]
+        print("queue time        p50 %s  p95 %s  p99 %s  max %s" % (
+            ms(queue["p50"]), ms(queue["p95"]), ms(queue["p99"]), ms(queue["max"]),
+        ))
+    if stub_stats:
+        print("gas stub          %s requests, %s documents, %s errors, %s rejected, peak %s in flight" % (
+            stub_stats["requests"], stub_stats["documents"], stub_stats["errors"],
+            stub_stats["rejected"], stub_stats["max_inflight"],
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay FE payloads against Odoo's Clocky send paths.")
+    parser.add_argument("--url", default="http://localhost:8069")
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--login", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--payloads", required=True, help="JSON lines file (see export_payloads)")
+    parser.add_argument("--mode", choices=sorted(MODES), default="pos")
+    parser.add_argument("--rps", type=float, default=10.0, help="calls per second")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--batch", type=int, default=1, help="payloads per call")
+    parser.add_argument("--drain-timeout", type=float, default=300.0,
+                        help="outbox mode: seconds to wait for the queue to drain")
+    parser.add_argument("--max-inflight", type=int, default=64, help="client threads")
+    parser.add_argument("--workers", type=int, default=None, help="Odoo workers, for the occupancy ratio")
+    parser.add_argument("--stub-url", default=None, help="GAS stub base URL, for its counters")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    items = load_items(args.payloads)
+    client = OdooClient(args.url, args.db, args.login, args.password)
+    before = fetch_stub_stats(args.stub_url) if args.stub_url else None
+    report = run(client, items, mode=args.mode, rps=args.rps, duration=args.duration,
+                 batch=max(args.batch, 1), max_inflight=args.max_inflight,
+                 drain_timeout=args.drain_timeout)
+    stub_stats = None
+    if before:
+        after = fetch_stub_stats(args.stub_url)
+        if after:
+            stub_stats = {key: after[key] - before[key] for key in ("requests", "documents", "errors", "rejected")}
+            stub_stats["max_inflight"] = after["max_inflight"]
+    if args.json:
+        report["workers"] = args.workers
+        report["stub"] = stub_stats
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, workers=args.workers, stub_stats=stub_stats)
+
+
+if __name__ == "__main__":
+    main()
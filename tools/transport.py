@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Title: Clocky HTTP transport
+Description:
+    Single HTTP(S) client shared by every Clocky sender (invoice outbox,
+    preview wizard and POS integration), so TLS setup and TCP handshakes are
+    paid once per host instead of once per document:
+
+      - one SSL context per process (system root certificates)
+      - a pool of keep-alive `http.client` connections keyed by host; a
+        request hitting a connection the server closed is retried on a
+        fresh one only if it was never written (a POST is never sent twice)
+      - separate connect / read timeouts
+      - compact JSON encoded incrementally (`iter_json`), optionally gzipped
+        on the fly (`Content-Encoding: gzip`) and streamed with
+        `Transfer-Encoding: chunked`, so a large payload is never held in
+        memory as a full string plus a full byte copy
+      - redirects followed like a browser (GAS answers POSTs with a 302
+        to script.googleusercontent.com that must be fetched with GET)
+      - an optional per-host circuit breaker (`tools.circuit_breaker`) and
+        a read timeout adapted to the observed latency of the sender
+
+    Only the standard library is used (no external dependencies).
+
+Recommended System Parameters:
+    - clocky.http_connect_timeout   (seconds, default 10)
+    - clocky.http_read_timeout      (seconds, default 25)
+    - clocky.http_gzip              ('1'/'true' to gzip request bodies; the
+                                     endpoint must accept Content-Encoding: gzip)
+    - clocky.http_chunked           ('1'/'true' to stream request bodies with
+                                     Transfer-Encoding: chunked)
+    - clocky.breaker_disabled       ('1'/'true' to never open the circuit)
+    - clocky.breaker_failures       (consecutive failures that open the circuit
+                                     of a host, default 5)
+    - clocky.breaker_cooldown       (seconds before a half-open probe, default 30)
+    - clocky.http_timeout_fixed     ('1'/'true' to always use the configured
+                                     read timeout, without adapting it)
+    - clocky.http_timeout_factor    (read timeout = p99 latency x factor,
+                                     default 3)
+    - clocky.http_timeout_floor     (lower bound of the adaptive read timeout,
+                                     seconds, default 5)
+"""
+
+import gzip
+import http.client
+import json
+import ssl
+import threading
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from . import circuit_breaker
+
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 25
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Compact separators, UTF-8 text kept as is (no \uXXXX escapes)
+_json_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+# Errors raised by a keep-alive connection the server already closed
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+# Methods that may be sent twice without side effects
+_IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+class TransportError(Exception):
+    """The request could not be completed (DNS, TCP, TLS, timeout...)."""
+
+
+class HTTPStatusError(TransportError):
+    """The server answered with an HTTP error status (>= 400)."""
+
+    def __init__(self, status, reason, body):
+        super().__init__("HTTP Error %s: %s" % (status, reason))
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class CircuitOpenError(TransportError):
+    """Not sent: the circuit breaker of the host is open."""
+
+    # No request was made: keep it out of the latency samples (see `metrics.timed`)
+    metrics_sample = False
+
+
+_ssl_context = None
+_ssl_lock = threading.Lock()
+
+
+def get_ssl_context():
+    """Return the per-process SSL context (created on first use)."""
+    global _ssl_context
+    if _ssl_context is None:
+        with _ssl_lock:
+            if _ssl_context is None:
+                # Respect system root certificates
+                _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def dumps(payload):
+    """Return the compact JSON text of `payload` (the format sent to GAS)."""
+    return _json_encoder.encode(payload)
+
+
+def iter_json(payload, chunk_size=JSON_CHUNK_SIZE):
+    """Yield the compact UTF-8 JSON encoding of `payload` in chunks of about `chunk_size` bytes."""
+    buf, size = [], 0
+    for piece in _json_encoder.iterencode(payload):
+        data = piece.encode("utf-8")
+        buf.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def iter_bytes(data, chunk_size=JSON_CHUNK_SIZE):
+    """Yield `data` (bytes) in slices of `chunk_size` bytes, without copying it."""
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def iter_gzip(chunks, level=6):
+    """Gzip a stream of byte chunks on the fly (a gzip member, wbits=31)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class ConnectionPool:
+    """Thread-safe pool of idle keep-alive connections keyed by (scheme, host, port).
+
+    A connection is handed to a single caller at a time: `acquire` pops it
+    from the pool and `release` puts it back once the response has been read.
+    """
+
+    def __init__(self, max_idle_per_host=MAX_IDLE_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, connect_timeout):
+        """Return ``(connection, reused)`` for `key`."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=connect_timeout, context=get_ssl_context())
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=connect_timeout)
+        return conn, False
+
+    def release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_pool = ConnectionPool()
+
+
+def _pool_key(url):
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "https").lower()
+    if scheme not in ("http", "https"):
+        raise TransportError("Unsupported URL scheme: %s" % url)
+    port = parts.port or (443 if scheme == "https" else 80)
+    return (scheme, parts.hostname, port), parts
+
+
+def _request_once(method, url, body, headers, connect_timeout, read_timeout):
+    """Send one request (no redirect handling) and return ``(response, data)``.
+
+    `body` is bytes, None, or a callable returning an iterable of byte
+    chunks; a fresh iterable is requested for every attempt and streamed with
+    ``Transfer-Encoding: chunked``.
+    """
+    key, parts = _pool_key(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+
+    for attempt in (1, 2):
+        conn, reused = _pool.acquire(key, connect_timeout)
+        sent = False
+        try:
+            if conn.sock is None:
+                conn.timeout = connect_timeout
+                conn.connect()
+            conn.sock.settimeout(read_timeout)
+            if callable(body):
+                conn.request(method, target, body=body(), headers=headers, encode_chunked=True)
+            else:
+                conn.request(method, target, body=body, headers=headers)
+            sent = True
+            resp = conn.getresponse()
+            data = resp.read()
+        except _STALE_CONNECTION_ERRORS as e:
+            conn.close()
+            # The server dropped an idle keep-alive connection: retry once on a
+            # fresh one, but only if the request never left (a POST the server
+            # may have received is not sent twice; the caller decides)
+            if reused and attempt == 1 and (not sent or method in _IDEMPOTENT_METHODS):
+                continue
+            raise TransportError(str(e)) from e
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise TransportError(str(e) or e.__class__.__name__) from e
+
+        if resp.will_close:
+            conn.close()
+        else:
+            _pool.release(key, conn)
+        return resp, data
+
+
+def _is_breaker_failure(error):
+    """Whether `error` means the host is unhealthy (a 4xx answer means it is up)."""
+    if isinstance(error, HTTPStatusError):
+        return error.status >= 500 or error.status == 429
+    return True
+
+
+def request(method, url, body=None, headers=None,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+            circuit=None):
+    """Perform an HTTP request through the shared pool.
+
+    `circuit` is ``(failure_threshold, reset_timeout)`` to guard the host
+    with its circuit breaker, or None.
+
+    Returns ``(status, text)``. Raises `HTTPStatusError` for statuses >= 400,
+    `CircuitOpenError` when the breaker of the host is open and
+    `TransportError` for network failures.
+    """
+    if not circuit:
+        return _request(method, url, body, headers, connect_timeout, read_timeout)
+
+    breaker = circuit_breaker.get(urlsplit(url).hostname or url, *circuit)
+    if not breaker.allow():
+        raise CircuitOpenError(
+            "Circuit open for %s after %s consecutive failures (next probe in %.0f s)"
+            % (breaker.name, breaker.failures, breaker.retry_in())
+        )
+    try:
+        result = _request(method, url, body, headers, connect_timeout, read_timeout)
+    except Exception as e:
+        if _is_breaker_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    breaker.record_success()
+    return result
+
+
+def _request(method, url, body, headers, connect_timeout, read_timeout):
+    headers = dict(headers or {})
+    headers.setdefault("Accept-Encoding", "gzip")
+
+    for _hop in range(MAX_REDIRECTS + 1):
+        resp, data = _request_once(method, url, body, headers, connect_timeout, read_timeout)
+        status = resp.status
+        location = resp.getheader("Location")
+        if status in (301, 302, 303, 307, 308) and location:
+            url = urljoin(url, location)
+            if status in (301, 302, 303):
+                # Browser semantics: the redirected request becomes a GET without body
+                method, body = "GET", None
+                headers = {
+                    k: v for k, v in headers.items()
+                    if k.lower() not in ("content-type", "content-encoding", "content-length")
+                }
+            continue
+
+        if (resp.getheader("Content-Encoding") or "").lower() == "gzip":
+            data = gzip.decompress(data)
+        text = data.decode("utf-8", errors="replace")
+        if status >= 400:
+            raise HTTPStatusError(status, resp.reason, text)
+        return status, text
+
+    raise TransportError("Too many redirects: %s" % url)
+
+
+def _post_body(chunks_factory, headers, compress, chunked):
+    """Build the request body from `chunks_factory` (a callable returning byte chunks)."""
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+        def factory():
+            return iter_gzip(chunks_factory())
+    else:
+        factory = chunks_factory
+    if chunked:
+        return factory
+    return b"".join(factory())
+
+
+def post_data(url, data, headers=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+              read_timeout=DEFAULT_READ_TIMEOUT, compress=False, chunked=False, circuit=None):
+    """POST an already serialized JSON body (bytes). Returns ``(status, text)``."""
+    headers = dict(headers or {})
+    headers.setdefault("Content-Type", "application/json")
+    body = data
+    if compress or chunked:
+        body = _post_body(lambda: iter_bytes(data), headers, compress, chunked)
+    return request("POST", url, body=body, headers=headers,
+                   connect_timeout=connect_timeout, read_timeout=read_timeout, circuit=circuit)
+
+
+def post_json(url, payload, headers=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+              read_timeout=DEFAULT_READ_TIMEOUT, compress=False, chunked=False, circuit=None):
+    """Encode `payload` as compact JSON, streamed into the body, and POST it.
+
+    Returns ``(status, text)``.
+    """
+    headers = dict(headers or {})
+    headers.setdefault("Content-Type", "application/json")
+    body = _post_body(lambda: iter_json(payload), headers, compress, chunked)
+    return request("POST", url, body=body, headers=headers,
+                   connect_timeout=connect_timeout, read_timeout=read_timeout, circuit=circuit)
+
+
+def options_from_settings(settings, read_timeout=DEFAULT_READ_TIMEOUT, stage=None):
+    """Build the transport options from the Clocky settings (`clocky.settings._get_all()`).
+
+    `read_timeout` is used when `clocky.http_read_timeout` is not set. With
+    `stage` (the `metrics` stage timing the sends, e.g. "invoice.http_send")
+    the read timeout adapts to the latency observed for it, up to the
+    configured value, unless `clocky.http_timeout_fixed` is set.
+    """
+    read_timeout = settings["http_read_timeout"] or read_timeout
+    if stage and not settings["http_timeout_fixed"] and settings["http_timeout_factor"] > 0:
+        read_timeout = circuit_breaker.adaptive_timeout(
+            stage, read_timeout,
+            minimum=settings["http_timeout_floor"], factor=settings["http_timeout_factor"],
+        )
+    circuit = None
+    if not settings["breaker_disabled"] and settings["breaker_failures"] > 0:
+        circuit = (settings["breaker_failures"], settings["breaker_cooldown"])
+    return {
+        "connect_timeout": settings["http_connect_timeout"],
+        "read_timeout": read_timeout,
+        "compress": settings["http_gzip"],
+        "chunked": settings["http_chunked"],
+        "circuit": circuit,
+    }